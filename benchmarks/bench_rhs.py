@@ -0,0 +1,73 @@
+"""Calls per second of the model right-hand sides and Jacobians, NumPy vs compiled.
+
+Run from the root of the repository:
+
+    python benchmarks/bench_rhs.py
+
+For every model function, the table lists single-state calls per second of the
+NumPy function, of `compiled(fun)` with parameters passed per call, of
+`compiled(fun, *args)` with bound parameters and of the raw in-place kernel,
+followed by the states per second of one stacked call on N = 1000 states.
+The compiled columns are only filled in when numba is installed.
+"""
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # make the shared `modeling` package importable
+from modeling import bistable, oscillators, switch
+from modeling.jit import COLUMN_KERNELS, HAVE_NUMBA, JACOBIANS, KERNELS, compiled
+
+MODELS = [
+    ("switch.ode", switch.ode, [0.1, 0.2], switch.PARAMS),
+    ("switch.jac", switch.jac, [0.1, 0.2], switch.PARAMS),
+    ("switch.ode_gk", switch.ode_gk, [0.1], switch.PARAMS),
+    ("switch.jac_gk", switch.jac_gk, [0.1], switch.PARAMS),
+    ("oscillators.ode_sd", oscillators.ode_sd, [1.0, 0.2], oscillators.PARAMS_SD),
+    ("oscillators.jac_sd", oscillators.jac_sd, [1.0, 0.2], oscillators.PARAMS_SD),
+    ("oscillators.ode_ai", oscillators.ode_ai, [1.5, 2.0], oscillators.PARAMS_AI),
+    ("oscillators.jac_ai", oscillators.jac_ai, [1.5, 2.0], oscillators.PARAMS_AI),
+    ("bistable.ode", bistable.ode, [1.0, 0.2], bistable.PARAMS),
+    ("bistable.jac", bistable.jac, [1.0, 0.2], bistable.PARAMS),
+]
+
+
+def calls_per_second(call, repeat=5, number=2000):
+    call()  # warm up (and compile)
+    return number / min(timeit.repeat(call, repeat=repeat, number=number))
+
+
+def main(n_stacked=1000):
+    columns = ["NumPy", "compiled", "bound", "kernel", "NumPy xN", "kernel xN"]
+    print(f"{'model':<22}" + "".join(f"{c:>13}" for c in columns))
+    for name, fun, y, args in MODELS:
+        y = np.array(y, dtype=float)
+        Y = np.tile(y[:, None], n_stacked)
+        rates = [calls_per_second(lambda: fun(0, y, *args))]
+        stacked = [calls_per_second(lambda: fun(0, Y, *args), number=100) * n_stacked]
+
+        if HAVE_NUMBA:
+            p, P = np.array(args, dtype=float), np.tile(np.array(args, dtype=float)[:, None], n_stacked)
+            shape = (len(y), len(y)) if fun in JACOBIANS else (len(y),)
+            out, out_stacked = np.empty(shape), np.empty(shape + (n_stacked,))
+            unbound, bound = compiled(fun), compiled(fun, *args)
+            kernel, kernel_columns = KERNELS[fun], COLUMN_KERNELS[fun]
+            rates += [
+                calls_per_second(lambda: unbound(0, y, *args)),
+                calls_per_second(lambda: bound(0, y)),
+                calls_per_second(lambda: kernel(y, p, out)),
+            ]
+            stacked += [calls_per_second(lambda: kernel_columns(Y, P, out_stacked), number=100) * n_stacked]
+        else:
+            rates += [np.nan] * 3
+            stacked += [np.nan]
+
+        print(f"{name:<22}" + "".join(f"{r:>13,.0f}" for r in rates + stacked))
+    if not HAVE_NUMBA:
+        print("numba is not installed, only the NumPy columns are measured")
+
+
+if __name__ == "__main__":
+    main()
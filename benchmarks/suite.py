@@ -0,0 +1,241 @@
+"""Benchmark suite of the model solvers with accuracy checks and a comparison against a stored baseline.
+
+Run from the root of the repository:
+
+    python benchmarks/suite.py                   # measure and compare with the baseline, if there is one
+    python benchmarks/suite.py --save-baseline   # measure and store the results as the new baseline
+    python benchmarks/suite.py --only solve      # only the benchmarks whose name contains "solve"
+
+Every benchmark times one code path (the best of `--repeat` runs, which is the
+least disturbed by other load on the machine) and checks its result against a
+reference, so a speedup that trades away accuracy fails like a slowdown:
+
+- `rhs/...`: right-hand side calls of every model, for one state and for
+  N = 1000 stacked states; the stacked call has to match the single ones,
+- `solve/...`: `modeling.solver.solve` at the parameter sets of the projects,
+  compared with a DOP853 solution at rtol = 1e-12,
+- `ensemble/...`: the trajectories of the phase portraits (`integrate_ensemble`)
+  at rtol = 1e-8, compared with the same reference over the time span of the
+  scripts (three to four periods of the oscillators, short enough for the
+  reference to stay phase-accurate),
+- `sweep/hysteresis`: the 401-point ascending steady-state sweep of the
+  switch; the steady states have to solve the model and the jump has to lie
+  at the fold found by continuation,
+- `animation/...`: drawing frames of the phase portrait animations (Agg).
+
+The results are written as JSON (`--output`). A benchmark is flagged as slower
+when its time exceeds the baseline by more than `--threshold`, and as
+inaccurate when its error exceeds its tolerance; the exit status is 1 if any
+benchmark is flagged. Timings only compare within one machine, so the
+baseline is not part of the repository.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import scipy
+from scipy.integrate import solve_ivp
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # make the shared `modeling` package importable
+from modeling import bistable, oscillators, switch
+from modeling.continuation import continuation
+from modeling.ensemble import integrate_ensemble
+from modeling.solver import solve
+from modeling.steady_state import steady_state_sweep
+
+OUTPUT = Path(__file__).resolve().parent / "output"
+
+# Model, initial conditions of the phase portraits (or the sweep) and time span, as in the scripts:
+MODELS = {
+    "switch.ode": (switch.ode, switch.PARAMS[:-1] + [1.5], [[0.0, 0.0]], (0, 400)),
+    "switch.ode_gk": (switch.ode_gk, switch.PARAMS[:-1] + [1.5], [[0.0]], (0, 400)),
+    "oscillators.ode_sd": (oscillators.ode_sd, oscillators.PARAMS_SD,
+                           [[1.0, 0.2], [0.5, 1.0], [3.0, 0.4], [3.0, 1.2]], (0, 100)),
+    "oscillators.ode_ai": (oscillators.ode_ai, oscillators.PARAMS_AI,
+                           [[1.5, 2.0], [0.5, 0.3], [0.25, 1.0], [1.25, 2.0], [1.0, 1.0]], (0, 100)),
+    "bistable.ode": (bistable.ode, bistable.PARAMS,
+                     [[1.0, 0.2], [0.1, 0.3], [1.0, 1.2], [0.0, 0.65], [0.4, 1.2], [0.0, 1.1], [0.5, 0.0]], (0, 40)),
+}
+
+# Axis limits of the phase portraits:
+PORTRAITS = {
+    "oscillators.ode_sd": ((0, 5), (0.01, 1.2)),
+    "oscillators.ode_ai": ((0, 2), (0, 2.5)),
+    "bistable.ode": ((0, 1.2), (0, 1.2)),
+}
+
+# Largest admissible errors, about three times what the code measures today, and ten times for the ensembles.
+# These are integrated at rtol = 1e-8: at the default rtol = 1e-3 of the scripts, the phase of the oscillations
+# drifts by about their amplitude over 100 time units, and no tolerance that loose could catch a wrong solution:
+RHS_TOLERANCE = 1e-12
+SOLVE_TOLERANCE = 1e-4
+ENSEMBLE_RTOL, ENSEMBLE_ATOL = 1e-8, 1e-10
+ENSEMBLE_TOLERANCES = {"oscillators.ode_sd": 2e-6, "oscillators.ode_ai": 6e-6, "bistable.ode": 1e-7}
+SWEEP_TOLERANCE = 1e-9
+
+
+def best_time(call, repeat, number=1):
+    """Seconds per call of `call`, the best of `repeat` measurements of `number` calls."""
+    call()  # warm up caches (and compile)
+    return min(timeit.repeat(call, repeat=repeat, number=number)) / number
+
+
+def reference(fun, t_span, y0, args, t_eval):
+    result = solve_ivp(fun, t_span, y0, method="DOP853", t_eval=t_eval, args=args, rtol=1e-12, atol=1e-12)
+    return result.y
+
+
+def bench_rhs(name, repeat, n_stacked=1000):
+    fun, args, y0, _ = MODELS[name]
+    rng = np.random.default_rng(0)
+    y = np.array(y0[0], dtype=float) + 0.1
+    Y = y[:, None] * rng.uniform(0.5, 1.5, (len(y), n_stacked))
+    single = np.stack([fun(0, column, *args) for column in Y.T], axis=1)
+    error = np.abs(fun(0, Y, *args) - single).max()
+    yield f"rhs/{name}", best_time(lambda: fun(0, y, *args), repeat, number=2000), "call", error, RHS_TOLERANCE
+    yield f"rhs/{name}/stacked", best_time(lambda: fun(0, Y, *args), repeat, number=100) / n_stacked, "state", \
+        error, RHS_TOLERANCE
+
+
+def bench_solve(name, repeat):
+    fun, args, y0, t_span = MODELS[name]
+    t_eval = np.linspace(*t_span, 201)
+    run = lambda: solve(fun, t_span, y0[0], args=args, t_eval=t_eval, rtol=1e-6, atol=1e-9)
+    error = np.abs(run().y - reference(fun, t_span, y0[0], args, t_eval)).max()
+    yield f"solve/{name}", best_time(run, repeat), "run", error, SOLVE_TOLERANCE
+
+
+def bench_ensemble(name, repeat):
+    fun, args, y0, t_span = MODELS[name]
+    t_eval = np.linspace(*t_span, 201)
+    run = lambda: integrate_ensemble(fun, t_span, y0, args=args, t_eval=t_eval, rtol=ENSEMBLE_RTOL,
+                                     atol=ENSEMBLE_ATOL)
+    y = run().y
+    error = max(np.abs(y[i] - reference(fun, t_span, start, args, t_eval)).max() for i, start in enumerate(y0))
+    yield f"ensemble/{name}", best_time(run, repeat), "run", error, ENSEMBLE_TOLERANCES[name]
+
+
+def bench_sweep(repeat):
+    p = list(switch.PARAMS)
+    S = np.linspace(0, 4, 401)
+    run = lambda: steady_state_sweep(switch.ode, switch.jac, [0, 0], S, p, t_span=[0, 400])
+    result = run()
+    residual = max(np.abs(switch.ode(0, y, *p[:-1], s)).max() for y, s in zip(result.y[result.success],
+                                                                            S[result.success]))
+
+    # The ascending sweep stays on the lower branch up to the fold at which it ends. Just beyond it, the state
+    # passes the ghost of the fold too slowly to settle within t_span, which the sweep has to report:
+    branch = continuation(switch.ode, [0, 0], p, jac=switch.jac, p_min=-1, p_max=4)
+    fold = max(point.p for point in branch.special if point.kind == "LP")
+    jump = S[np.argmax(np.diff(result.y[:, 0])) + 1]
+    ghost = (S >= fold) & (S < jump)
+    error = residual if fold <= jump <= fold + 0.05 and result.success[~ghost].all() else np.inf
+    yield "sweep/hysteresis", best_time(run, repeat), "run", error, SWEEP_TOLERANCE
+
+
+def bench_animation(name, repeat, frames=20):
+    import matplotlib
+
+    matplotlib.use("Agg")  # the plotting layer is only loaded here
+    import matplotlib.pyplot as plt
+    from modeling.phase_plane import nullclines, vector_field
+    from modeling.plotting import Trajectories, draw_nullclines, draw_vector_field
+
+    fun, args, y0, t_span = MODELS[name]
+    x, y = (np.linspace(*limits, 200) for limits in PORTRAITS[name])
+    fig, ax = plt.subplots(figsize=(12, 8), dpi=100)
+    draw_vector_field(ax, vector_field(fun, x[::7], y[::7], args))
+    draw_nullclines(ax, nullclines(fun, x, y, args), ["nullcline 1", "nullcline 2"])
+    trajectories = Trajectories(ax, integrate_ensemble(fun, t_span, y0, args=args,
+                                                       t_eval=np.linspace(*t_span, frames)).y)
+    ax.legend()
+
+    def draw():
+        for frame in range(frames):
+            trajectories.update(frame)
+            fig.canvas.draw()
+
+    yield f"animation/{name}", best_time(draw, repeat) / frames, "frame", None, None
+    plt.close(fig)
+
+
+# Group (for `--only`), function and arguments before `repeat` of every benchmark. The functions yield the name,
+# the seconds per unit, the unit, the error (None if not checked) and the tolerance of each of their measurements:
+BENCHMARKS = [(f"rhs/{name}", bench_rhs, (name,)) for name in MODELS] \
+    + [(f"solve/{name}", bench_solve, (name,)) for name in MODELS] \
+    + [(f"ensemble/{name}", bench_ensemble, (name,)) for name in PORTRAITS] \
+    + [("sweep/hysteresis", bench_sweep, ())] \
+    + [(f"animation/{name}", bench_animation, (name,)) for name in PORTRAITS]
+
+
+def environment():
+    return {"python": platform.python_version(), "numpy": np.__version__, "scipy": scipy.__version__,
+            "machine": platform.machine(), "processor": platform.processor(), "system": platform.system()}
+
+
+def run(only=None, repeat=5):
+    """Run the benchmarks whose name contains `only` (all by default), returning the JSON record."""
+    results = {}
+    measurements = (result for group, bench, args in BENCHMARKS if only is None or only in group
+                    for result in bench(*args, repeat))
+    for name, seconds, unit, error, tolerance in measurements:
+        results[name] = {"seconds": seconds, "unit": unit, "rate": 1 / seconds,
+                         "error": None if error is None else float(error), "tolerance": tolerance,
+                         "accurate": error is None or bool(error <= tolerance)}
+    return {"created": datetime.now(timezone.utc).isoformat(timespec="seconds"), "environment": environment(),
+            "results": results}
+
+
+def compare(record, baseline, threshold=0.2):
+    """Print the results next to the baseline and return the names of the flagged benchmarks."""
+    old = baseline["results"] if baseline is not None else {}
+    flagged = []
+    print(f"{'benchmark':<36}{'rate':>22}{'vs baseline':>13}{'error':>11}  status")
+    for name, result in record["results"].items():
+        ratio = result["seconds"] / old[name]["seconds"] if name in old else np.nan
+        status = []
+        if ratio > 1 + threshold:
+            status.append("SLOWER")
+        if not result["accurate"]:
+            status.append("INACCURATE")
+        if status:
+            flagged.append(name)
+        error = "" if result["error"] is None else f"{result['error']:.1e}"
+        rate = f"{result['rate']:,.1f} {result['unit']}s/s"
+        ratio = f"{ratio:.2f}x" if np.isfinite(ratio) else "-"
+        print(f"{name:<36}{rate:>22}{ratio:>13}{error:>11}  " + (", ".join(status) or "ok"))
+    if baseline is not None and baseline["environment"] != record["environment"]:
+        print("The baseline was measured in a different environment:", baseline["environment"])
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", help="only run the benchmarks whose name contains this string")
+    parser.add_argument("--repeat", type=int, default=5, help="measurements per benchmark (the best counts)")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown that is flagged")
+    parser.add_argument("--output", type=Path, default=OUTPUT / "results.json")
+    parser.add_argument("--baseline", type=Path, default=OUTPUT / "baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    options = parser.parse_args()
+
+    start = time.perf_counter()
+    record = run(options.only, options.repeat)
+    baseline = json.loads(options.baseline.read_text()) if options.baseline.exists() else None
+    flagged = compare(record, None if options.save_baseline else baseline, options.threshold)
+
+    for path in [options.output] + ([options.baseline] if options.save_baseline else []):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(record, indent=2))
+    print(f"{len(record['results'])} benchmarks in {time.perf_counter() - start:.0f} s, written to {options.output}")
+    return 1 if flagged else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
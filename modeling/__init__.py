@@ -0,0 +1,58 @@
+"""Shared compute code for the mathematical modeling projects.
+
+The project directories contain the notebooks and animation scripts; the models
+and numerical routines they share live in this package.
+
+Importing the package loads nothing: the submodules and the names in `__all__`
+are imported on first access (`modeling.ode_sd`, `from modeling import
+sweep_batch`), so a worker process that only evaluates a model pays for NumPy
+and nothing else. The compute modules depend on NumPy and SciPy only.
+`plotting` and `animation` form the plotting layer: they are the only modules
+that import matplotlib, and no compute module imports them.
+
+Functions with generic names (`ode`, `jac`, `PARAMS`) or the name of their
+module (`continuation`, `scan`, `steady_state`) are only available from their
+modules, e.g. `modeling.switch.ode` or `modeling.continuation.continuation`.
+"""
+import importlib
+
+_EXPORTS = {
+    "archive": ["Archive", "ArchiveWriter", "write_ensemble"],
+    "cache": ["Cache", "cached_call"],
+    "continuation": ["finite_difference_jac"],
+    "ensemble": ["integrate_ensemble"],
+    "events": ["analyze", "analyze_scan"],
+    "jit": ["compiled"],
+    "kinetics": ["gk_table", "goldbeter_koshland", "goldbeter_koshland_du1"],
+    "network": ["ReactionNetwork", "parse_reactions"],
+    "oscillators": ["jac_ai", "jac_sd", "ode_ai", "ode_ai_table", "ode_sd", "ode_sd_table"],
+    "periodic": ["limit_cycle", "periodic_orbit", "periodic_orbit_sweep"],
+    "phase_plane": ["nullclines", "vector_field"],
+    "profiling": ["Profile", "profile"],
+    "reduction": ["Reduction", "integrate_reduced"],
+    "scan": ["parameter_grid", "run_scan"],
+    "sensitivity": ["adjoint_gradient", "fit", "parameter_jac", "sensitivities"],
+    "solver": ["select_method", "solve"],
+    "stochastic": ["simulate", "simulate_chunks"],
+    "steady_state": ["integrate_to_steady_state", "is_stable", "newton", "steady_state_sweep"],
+    "store": ["TrajectoryStore"],
+    "sweep": ["steady_distance", "sweep_batch", "sweep_continuation"],
+}
+_LOCATIONS = {name: module for module, names in _EXPORTS.items() for name in names}
+_SUBMODULES = {*_EXPORTS, "animation", "bistable", "mechanisms", "plotting", "switch"}
+
+__all__ = sorted(_LOCATIONS)
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    if name not in _LOCATIONS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_LOCATIONS[name]}", __name__), name)
+    globals()[name] = value  # later lookups do not go through __getattr__
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *__all__, *_SUBMODULES})
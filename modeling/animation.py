@@ -0,0 +1,311 @@
+"""Helpers for the animations of the scripts: decimated traces and streamed export.
+
+The animations reveal precomputed solutions frame by frame. Drawing the whole
+prefix `y[:frame]` and taking its minimum and maximum on every frame makes a
+frame cost proportional to the length of the prefix, so an animation of n
+samples costs O(n^2). `Trace` precomputes what every frame needs once:
+
+- the running minimum and maximum, so the axis limits of a frame are a lookup,
+- a pyramid of the minimum and maximum of blocks of 2, 4, 8, ... samples, so a
+  prefix is drawn with at most `max_points` points that keep every peak (the
+  extrema of each block) instead of all of its samples.
+
+Scripts with fixed axes should create their artists once, return them from the
+update function and animate with `blit=True`; scripts whose axis limits follow
+the data (like the full response of the switch) need a full redraw per frame
+anyway and only profit from `Trace`.
+
+`save` writes an animation frame by frame: GIFs are encoded into the file as
+each frame is drawn (`GifWriter`), other formats are piped to ffmpeg. Neither
+keeps the frames in memory, unlike matplotlib's `PillowWriter`. `export` does
+the same for a figure and its update function, without an `Animation`: chunks
+of frames are rendered in worker processes, blitted where the axes are fixed,
+and GIF frames only store the pixels that changed since the frame before,
+which makes the files of the phase portraits (a few moving dots and lines over
+a fixed figure) about fifty times smaller.
+
+Together with `modeling.plotting`, this is the plotting layer of the package:
+the only modules that need matplotlib (and Pillow, which matplotlib depends
+on).
+"""
+import multiprocessing
+import struct
+import subprocess
+from io import BytesIO
+
+import numpy as np
+from matplotlib import animation, rcParams
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import GifImagePlugin, Image
+
+GIF_MAX_FPS = 50  # GIF delays are whole centiseconds, and viewers slow down delays below 2 cs
+
+
+class Trace:
+    """Time series `y(x)` that is revealed frame by frame, see the module docstring."""
+
+    def __init__(self, x, y, max_points=2000):
+        self.x, self.y = np.asarray(x), np.asarray(y)
+        self.max_points = max_points
+        self.running_min = np.minimum.accumulate(self.y)
+        self.running_max = np.maximum.accumulate(self.y)
+
+        # Level L holds the indices of the minimum and maximum of every full block of 2**L samples:
+        index = np.arange(len(self.y))
+        self.levels = [(index, index)]
+        while len(self.levels[-1][0]) > 1:
+            i_min, i_max = self.levels[-1]
+            m = len(i_min) // 2
+            a_min, b_min, a_max, b_max = i_min[0:2 * m:2], i_min[1:2 * m:2], i_max[0:2 * m:2], i_max[1:2 * m:2]
+            self.levels.append((np.where(self.y[a_min] <= self.y[b_min], a_min, b_min),
+                                np.where(self.y[a_max] >= self.y[b_max], a_max, b_max)))
+
+    def limits(self, stop):
+        """Minimum and maximum of `y[:stop]`."""
+        return self.running_min[stop - 1], self.running_max[stop - 1]
+
+    def data(self, stop):
+        """`x[:stop]` and `y[:stop]`, reduced to the extrema of blocks if longer than `max_points`.
+
+        The reduced prefix has at most `max_points + 2 * log2(stop)` points: the
+        samples after the last full block are covered by one smaller block per
+        lower level (the binary digits of their count).
+        """
+        level = 0
+        while stop >> level > max(self.max_points // 2, 1):
+            level += 1
+        if level == 0:
+            return self.x[:stop], self.y[:stop]
+
+        blocks = stop >> level
+        i_min, i_max = self.levels[level]
+        pairs = [np.stack([i_min[:blocks], i_max[:blocks]], axis=1)]
+        start = blocks << level
+        for lower in range(level - 1, -1, -1):  # samples after the last full block
+            if (stop >> lower) & 1:
+                j_min, j_max = self.levels[lower]
+                pairs.append(np.array([[j_min[start >> lower], j_max[start >> lower]]]))
+                start += 1 << lower
+        index = np.unique(np.concatenate(pairs))  # sorted, and single samples (level 0) only once
+        return self.x[index], self.y[index]
+
+
+class GifWriter(animation.AbstractMovieWriter):
+    """Movie writer that encodes every frame into the GIF file as soon as it is drawn.
+
+    Every frame gets its own (local) palette, so colours that only appear in
+    later frames are kept.
+    """
+
+    def setup(self, fig, outfile, dpi=None):
+        super().setup(fig, outfile, dpi=dpi)
+        self._file = open(outfile, "wb")
+        self._header = True
+
+    def grab_frame(self, **savefig_kwargs):
+        buffer = BytesIO()
+        self.fig.savefig(buffer, **{**savefig_kwargs, "format": "rgba", "dpi": self.dpi})
+        frame = Image.frombuffer("RGBA", self.frame_size, buffer.getbuffer(), "raw", "RGBA", 0, 1)
+        frame = frame.convert("RGB").quantize()
+
+        if self._header:
+            header, _ = GifImagePlugin.getheader(frame.copy(), info={"loop": 0})
+            self._file.write(b"".join(header))
+            self._header = False
+        self._file.write(b"".join(GifImagePlugin.getdata(frame, duration=1000 / self.fps, include_color_table=True)))
+
+    def finish(self):
+        self._file.write(b";")  # GIF trailer
+        self._file.close()
+
+
+def save(ani, path, fps=30, dpi=None):
+    """Save the animation `ani` to `path`, streaming the frames to the file (GIF) or to ffmpeg."""
+    writer = GifWriter(fps=fps) if str(path).lower().endswith(".gif") else animation.FFMpegWriter(fps=fps)
+    ani.save(path, writer=writer, dpi=dpi)
+
+
+# Figure, update function, frames and options of the running `export`; the worker processes inherit it (fork):
+_job = None
+
+
+def _render(frame, background=None):
+    """RGBA pixels (height, width, 4) of the figure of the running export at `frame`.
+
+    With a `background` (blitting), only the artists that `update` returns are
+    drawn over it.
+    """
+    fig = _job["fig"]
+    artists = _job["update"](frame)
+    if background is None:
+        fig.canvas.draw()
+    else:
+        fig.canvas.restore_region(background)
+        for artist in artists:
+            fig.draw_artist(artist)
+    return np.array(fig.canvas.buffer_rgba())
+
+
+def _background():
+    """Figure without the animated artists (those that `update` returns), for blitting."""
+    fig = _job["fig"]
+    for artist in _job["update"](_job["frames"][0]):
+        artist.set_animated(True)
+    fig.canvas.draw()
+    return fig.canvas.copy_from_bbox(fig.bbox)
+
+
+def _palette(pixels):
+    """Palette of at most 255 colours (k, 3) and the index of every pixel of `pixels` (N, 4) in it.
+
+    The most frequent colours (the background, the lines, the cores of markers)
+    are kept exactly; the others, mostly antialiasing blends, get the nearest
+    kept colour.
+    """
+    colours, index = np.unique(pixels.view(np.uint32)[:, 0], return_inverse=True)
+    rgb = colours.view(np.uint8).reshape(-1, 4)[:, :3].astype(np.int32)
+    if len(colours) <= 255:
+        return rgb, index
+    keep = rgb[np.argsort(-np.bincount(index), kind="stable")[:255]]
+    nearest = np.concatenate([((block[:, None, :] - keep[None]) ** 2).sum(axis=2).argmin(axis=1)
+                              for block in np.array_split(rgb, max(1, len(rgb) // 4096))])
+    return keep, nearest[index]
+
+
+def _gif_frame(pixels, previous):
+    """GIF image block of the pixels that changed since `previous` (None for a full frame), or None if none did.
+
+    Returns the image descriptor and data (without a graphic control extension)
+    and the transparency index of the unchanged pixels inside the block. Only
+    the changed pixels enter the (local) palette of the block.
+    """
+    packed = pixels.view(np.uint32)[:, :, 0]  # one number per RGBA pixel
+    if previous is None:
+        changed = np.ones(packed.shape, dtype=bool)
+    else:
+        changed = packed != previous.view(np.uint32)[:, :, 0]
+    rows, cols = np.flatnonzero(changed.any(axis=1)), np.flatnonzero(changed.any(axis=0))
+    if not len(rows):
+        return None
+    y0, y1, x0, x1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+    changed = changed[y0:y1, x0:x1]
+
+    palette, colours = _palette(pixels[y0:y1, x0:x1][changed])
+    transparency = len(palette)  # one entry after the colours of the block
+    index = np.full(changed.shape, transparency, dtype=np.uint8)  # unchanged pixels show the previous frame
+    index[changed] = colours
+    image = Image.fromarray(index, mode="P")
+    image.putpalette(palette.astype(np.uint8).ravel().tolist() + [0, 0, 0])
+    data = b"".join(GifImagePlugin.getdata(image, offset=(int(x0), int(y0)), include_color_table=True))
+    return data, None if previous is None else transparency
+
+
+def _render_chunk(chunk):
+    """Render the frames `frames[start:stop]` and encode them, see `export`."""
+    start, stop = chunk
+    frames, gif = _job["frames"], _job["gif"]
+    background = _background() if _job["blit"] else None
+    previous = _render(frames[start - 1], background) if gif and start > 0 else None  # reference for the first delta
+    encoded = []
+    for i in range(start, stop):
+        pixels = _render(frames[i], background)
+        encoded.append(_gif_frame(pixels, previous) if gif else pixels[:, :, :3].tobytes())
+        previous = pixels
+    return encoded
+
+
+def _gif_header(width, height):
+    """GIF header without a global colour table, looping forever."""
+    return b"GIF89a" + struct.pack("<HHBBB", width, height, 0, 0, 0) \
+        + b"!\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00"
+
+
+def _graphic_control(delay, transparency):
+    """Graphic control extension: keep the previous frame under this one for `delay` centiseconds."""
+    flags = (1 << 2) | (transparency is not None)
+    return b"!\xf9\x04" + struct.pack("<BHB", flags, delay, transparency or 0) + b"\x00"
+
+
+def export(fig, update, frames, path, fps=30, duration=None, blit=False, dpi=None, processes=None, chunk_size=40):
+    """Render `update(frame)` of `fig` for all `frames` and write them to `path` (GIF, or any format of ffmpeg).
+
+    `update` has to draw a frame from the frame number alone, like the update
+    functions of `FuncAnimation` in the scripts. With `blit=True` (for figures
+    whose axes do not change), the rest of the figure is drawn once and every
+    frame only draws the artists that `update` returns. The frames play at
+    `fps`; with a `duration` in seconds, they are decimated evenly to
+    `fps * duration`, and GIFs are decimated to at most `GIF_MAX_FPS` frames per
+    second at the same speed, with the delays spread so that the total duration
+    is exact.
+
+    The frames are rendered in chunks of `chunk_size` on a pool of `processes`
+    workers (default: one per core; `processes=1` renders here, as does any
+    platform without fork, since the workers inherit the figure). Each worker
+    delta-encodes the GIF frames of its chunk: only the bounding box of the
+    pixels that changed since the previous frame is stored, with the unchanged
+    pixels inside it transparent, and frames without changes extend the delay
+    of the one before. Other formats get the full frames piped to ffmpeg,
+    whose encoder does the same. The chunks are written in order as they
+    arrive, so no more than a few chunks are held in memory.
+    """
+    global _job
+    frames = list(frames)
+    if not frames:
+        raise ValueError("No frames to export")
+    if duration is not None and len(frames) > fps * duration:
+        keep = np.linspace(0, len(frames) - 1, max(1, round(fps * duration))).round().astype(int)
+        frames = [frames[i] for i in keep]
+    gif = str(path).lower().endswith(".gif")
+    if gif and fps > GIF_MAX_FPS:
+        step = int(np.ceil(fps / GIF_MAX_FPS))
+        frames, fps = frames[::step], fps / step
+
+    canvas, figure_dpi = fig.canvas, fig.dpi
+    if dpi is not None:
+        fig.set_dpi(dpi)
+    FigureCanvasAgg(fig)  # draws without a window, also in the workers
+    width, height = fig.canvas.get_width_height()
+    _job = dict(fig=fig, update=update, frames=frames, gif=gif, blit=blit)
+    animated = {artist: artist.get_animated() for artist in (update(frames[0]) if blit else ())}
+    chunks = [(start, min(start + chunk_size, len(frames))) for start in range(0, len(frames), chunk_size)]
+    pool = None
+    if processes != 1 and len(chunks) > 1 and "fork" in multiprocessing.get_all_start_methods():
+        pool = multiprocessing.get_context("fork").Pool(processes)
+        results = pool.imap(_render_chunk, chunks)
+    else:
+        results = map(_render_chunk, chunks)
+
+    try:
+        if gif:
+            ends = np.round(np.arange(1, len(frames) + 1) * 100 / fps).astype(int)  # end of every frame in cs
+            delays = np.diff(ends, prepend=0)
+            with open(path, "wb") as file:
+                file.write(_gif_header(width, height))
+                pending, delay = None, 0  # a frame is written once its delay is known
+                for encoded, frame_delay in zip((encoded for chunk in results for encoded in chunk), delays):
+                    if encoded is not None:
+                        if pending is not None:
+                            file.write(_graphic_control(delay, pending[1]) + pending[0])
+                        pending, delay = encoded, 0
+                    delay += frame_delay
+                file.write(_graphic_control(delay, pending[1]) + pending[0])
+                file.write(b";")
+        else:
+            command = [rcParams["animation.ffmpeg_path"], "-y", "-loglevel", "error", "-f", "rawvideo",
+                       "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "pipe:",
+                       "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-pix_fmt", "yuv420p", str(path)]
+            with subprocess.Popen(command, stdin=subprocess.PIPE) as ffmpeg:
+                for chunk in results:
+                    for pixels in chunk:
+                        ffmpeg.stdin.write(pixels)
+                ffmpeg.stdin.close()
+            if ffmpeg.returncode:
+                raise RuntimeError(f"ffmpeg failed with exit status {ffmpeg.returncode}")
+    finally:
+        if pool is not None:
+            pool.terminate()
+        _job = None
+        for artist, state in animated.items():
+            artist.set_animated(state)
+        fig.set_canvas(canvas)
+        fig.set_dpi(figure_dpi)
@@ -0,0 +1,133 @@
+"""On-disk trajectory archives that are written while a sweep runs and read lazily.
+
+An archive is a directory with one raw binary file per column (`<name>.bin`)
+and a header `archive.json` with the column names, the dtype, the number of
+samples, whether the archive is `complete` and the parameter index: the list
+of segments `{"params": ..., "start": ..., "stop": ...}` that maps parameter
+points (e.g. one signal step of a sweep) to rows, like `TrajectoryStore.index`.
+
+`ArchiveWriter` has the interface of `modeling.store.TrajectoryStore`. It
+buffers `chunk_size` samples in memory and appends them to the column files
+chunk by chunk, so a sweep can be larger than memory. The header is rewritten
+after every chunk, so an interrupted sweep leaves a readable (incomplete)
+archive of all chunks written so far.
+
+`Archive` maps the column files with `np.memmap`: `archive["R"][i:j]` only
+reads the part of the file that is accessed, so plots can be redone from a
+stored sweep without simulating it again.
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+
+from .store import TrajectoryStore
+
+HEADER = "archive.json"
+
+
+class ArchiveWriter:
+    """Write the columns `names` to a new archive in the directory `path`."""
+
+    def __init__(self, path, names, chunk_size=2**16, dtype=float):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.names = list(names)
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = chunk_size
+        self.size = 0  # samples written to the files
+        self.index = []
+        self._buffer = TrajectoryStore(names, capacity=chunk_size, dtype=dtype)
+        self._files = {name: open(self.path / f"{name}.bin", "wb") for name in self.names}
+        self._write_header(complete=False)
+
+    def __len__(self):
+        return self.size + len(self._buffer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *_):
+        self.close(complete=exc_type is None)
+
+    def append(self, params=None, **columns):
+        """Append samples like `TrajectoryStore.append`."""
+        start = len(self)
+        self._buffer.append(**columns)
+        if params is not None:
+            self.index.append({"params": _json_params(params), "start": start, "stop": len(self)})
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered samples to the column files and update the header."""
+        for name in self.names:
+            self._files[name].write(self._buffer[name].tobytes())
+            self._files[name].flush()
+        self.size += len(self._buffer)
+        self._buffer.clear()
+        self._write_header(complete=False)
+
+    def close(self, complete=True):
+        """Write the remaining samples and close the files. Returns the finished `Archive`.
+
+        With `complete=False` (used when the `with` block raised), the archive
+        keeps all samples but is left marked as incomplete.
+        """
+        if not self._files:
+            return Archive(self.path)
+        self.flush()
+        for file in self._files.values():
+            file.close()
+        self._files = {}
+        self._write_header(complete=complete)
+        return Archive(self.path)
+
+    def _write_header(self, complete):
+        index = [dict(segment, stop=min(segment["stop"], self.size)) for segment in self.index
+                 if segment["start"] < self.size]
+        header = {"names": self.names, "dtype": self.dtype.str, "size": self.size, "complete": complete,
+                  "index": index}
+        (self.path / HEADER).write_text(json.dumps(header, indent=1))
+
+
+class Archive:
+    """Read-only, memory-mapped view of an archive written by `ArchiveWriter`."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        header = json.loads((self.path / HEADER).read_text())
+        self.names, self.size, self.index = header["names"], header["size"], header["index"]
+        self.complete = header["complete"]
+        dtype = np.dtype(header["dtype"])
+        self._columns = {name: np.memmap(self.path / f"{name}.bin", dtype=dtype, mode="r", shape=(self.size,))
+                         if self.size else np.empty(0, dtype=dtype) for name in self.names}
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, name):
+        """Memory-mapped column `name`."""
+        return self._columns[name]
+
+    def columns(self):
+        return dict(self._columns)
+
+    segments = TrajectoryStore.segments
+
+    def stacked(self, names, **params):
+        """Segments of equal length as one array (n_segments, len(names), length), e.g. an ensemble."""
+        return np.array([[self[name][segment] for name in names] for segment in self.segments(**params)])
+
+
+def write_ensemble(path, t, y, names, y0):
+    """Store an ensemble `y` of shape (n_traj, n, len(t)) with one segment per initial condition in `y0`."""
+    with ArchiveWriter(path, ["t", *names]) as writer:
+        for y0_i, y_i in zip(y0, y):
+            writer.append(params=dict(zip([f"{name}_0" for name in names], y0_i)), t=t,
+                          **dict(zip(names, y_i)))
+    return Archive(path)
+
+
+def _json_params(params):
+    return {key: value.item() if isinstance(value, np.generic) else value for key, value in params.items()}
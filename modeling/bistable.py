@@ -0,0 +1,28 @@
+"""Bistable system of the phase plane analysis with two stable and one unstable fixed point."""
+import numpy as np
+
+
+def ode(t, y, k):
+    dydt = np.array([
+        y[1] - y[0],
+        y[0]**2 / (k**2 + y[0]**2) - y[1]
+    ])
+    return dydt
+
+
+def jac(t, y, k):
+    """Analytic Jacobian of `ode`."""
+    zero = np.zeros_like(y[0] * y[1], dtype=float)
+    return np.array([
+        [zero - 1, zero + 1],
+        [2 * y[0] * k**2 / (k**2 + y[0]**2)**2 + zero, zero - 1]
+    ])
+
+
+def fixed_points(k):
+    """The three fixed points u = v of `ode` (they only exist for k < 1/2)."""
+    return np.array([0, (1 - np.sqrt(1 - 4 * k**2)) / 2, (1 + np.sqrt(1 - 4 * k**2)) / 2])
+
+
+# PARAMETER VALUES USED IN THE PHASE PLANE PROJECT
+PARAMS = [0.45]  # k
@@ -0,0 +1,230 @@
+"""Persistent cache of simulation results, keyed on everything that determines them.
+
+`solve_ivp` is a drop-in replacement for `scipy.integrate.solve_ivp` that
+stores every result on disk and returns the stored result when the same
+problem is solved again, e.g. when a script is run again to change the styling
+of a figure. `cached_call(fun, *args, **kwargs)` does the same for any other
+integrator such as `modeling.ensemble.integrate_ensemble`.
+
+The key is a SHA-256 hash of the function and all arguments:
+
+- functions are hashed by their source code, together with the source of the
+  functions and classes they use through module globals or through attributes
+  of the modules of the package (so a change of `goldbeter_koshland`
+  invalidates the results of `ode_gk`, and a change of `GKTable` those of
+  `ode_sd_table`) and the values of their closures; wrappers such as
+  `functools.lru_cache` are unwrapped and classes are hashed by their source,
+- numbers and arrays by their values (as float64 where they are numeric), so
+  `args`, `y0`, `t_span`, `t_eval` and solver options all enter the key,
+- functions of numpy, scipy and the standard library are hashed by name, and
+  the versions of numpy and scipy are part of every key.
+
+Results are pickled into one file per key in the cache directory
+(`MODELING_CACHE_DIR`, default `~/.cache/mathematical-modeling`). When the
+files exceed `max_bytes`, the least recently used are deleted. Setting
+`MODELING_CACHE=off` disables the cache.
+"""
+import hashlib
+import inspect
+import os
+import pickle
+import sys
+import tempfile
+import types
+from pathlib import Path
+
+import numpy as np
+import scipy
+
+DEFAULT_DIR = Path.home() / ".cache" / "mathematical-modeling"
+LIBRARIES = {"numpy", "scipy", "numba", "matplotlib", *sys.stdlib_module_names}
+
+_digests = {}  # source digests of functions without closures, computed once per process
+
+
+class Cache:
+    """Results of function calls, stored in `path` and limited to `max_bytes` in total."""
+
+    def __init__(self, path=None, max_bytes=2**30, enabled=True):
+        self.path = Path(path if path is not None else os.environ.get("MODELING_CACHE_DIR", DEFAULT_DIR))
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = self.misses = 0
+
+    def key(self, fun, *args, **kwargs):
+        """Hex digest identifying the call `fun(*args, **kwargs)`."""
+        h = hashlib.sha256()
+        _update(h, (np.__version__, scipy.__version__, fun, args, kwargs), set())
+        return h.hexdigest()
+
+    def call(self, fun, *args, **kwargs):
+        """`fun(*args, **kwargs)`, loaded from the cache if it was computed before."""
+        if not self.enabled:
+            return fun(*args, **kwargs)
+
+        file = self.path / f"{self.key(fun, *args, **kwargs)}.pkl"
+        try:
+            with open(file, "rb") as f:
+                result = pickle.load(f)
+            os.utime(file)  # mark as recently used
+            self.hits += 1
+            return result
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            pass  # not cached yet, or stored by an incompatible version
+
+        self.misses += 1
+        result = fun(*args, **kwargs)
+        self.path.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.path, suffix=".tmp", delete=False) as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f.name, file)  # atomic, so concurrent runs never read half a file
+        self.evict()
+        return result
+
+    def solve_ivp(self, fun, t_span, y0, **options):
+        """Cached `scipy.integrate.solve_ivp`."""
+        import scipy.integrate  # only loaded by the callers that integrate, not by `cached_call`
+
+        return self.call(scipy.integrate.solve_ivp, fun, t_span, y0, **options)
+
+    def evict(self):
+        """Delete the least recently used results until the cache fits into `max_bytes`."""
+        files = [(file.stat(), file) for file in self.path.glob("*.pkl")]
+        total = sum(stat.st_size for stat, _ in files)
+        for stat, file in sorted(files, key=lambda item: item[0].st_mtime):
+            if total <= self.max_bytes:
+                break
+            file.unlink(missing_ok=True)
+            total -= stat.st_size
+
+    def clear(self):
+        for file in self.path.glob("*.pkl"):
+            file.unlink(missing_ok=True)
+
+
+def _update(h, value, seen):
+    """Feed a canonical representation of `value` into the hash `h`."""
+    if isinstance(value, (str, bytes, bool, type(None))):
+        h.update(repr(value).encode())
+    elif isinstance(value, (int, float, np.number)) or (isinstance(value, np.ndarray) and value.dtype.kind in "iuf"):
+        array = np.ascontiguousarray(value, dtype=float)
+        h.update(f"array{array.shape}".encode())
+        h.update(array.tobytes())
+    elif isinstance(value, np.ndarray):
+        h.update(f"{value.dtype}{value.shape}".encode())
+        for item in value.ravel():
+            _update(h, item, seen)
+    elif isinstance(value, (list, tuple)):
+        try:
+            array = np.asarray(value, dtype=float)  # numeric sequences hash like arrays
+        except (TypeError, ValueError):
+            h.update(f"{type(value).__name__}{len(value)}".encode())
+            for item in value:
+                _update(h, item, seen)
+        else:
+            _update(h, array, seen)
+    elif isinstance(value, dict):
+        h.update(b"dict")
+        for key in sorted(value, key=repr):
+            _update(h, key, seen)
+            _update(h, value[key], seen)
+    elif callable(value):
+        _update_function(h, value, seen)
+    else:
+        h.update(repr(value).encode())
+
+
+def _update_function(h, fun, seen):
+    fun = inspect.unwrap(getattr(fun, "py_func", fun))  # numba dispatchers, functools.lru_cache and wraps
+    if isinstance(fun, type):
+        _update_class(h, fun, seen)
+        return
+    module = getattr(fun, "__module__", None) or ""
+    if not isinstance(fun, types.FunctionType) or module.split(".")[0] in LIBRARIES:
+        # Library functions are identified by name, their versions are part of the key:
+        h.update(f"{module}.{getattr(fun, '__qualname__', repr(fun))}".encode())
+        return
+    if fun in seen:
+        h.update(fun.__qualname__.encode())
+        return
+    seen.add(fun)
+    if fun.__closure__ is None and fun in _digests:
+        h.update(_digests[fun])
+        return
+
+    f = hashlib.sha256()
+    try:
+        f.update(inspect.getsource(fun).encode())
+    except (OSError, TypeError):
+        f.update(fun.__code__.co_code)
+    for cell in fun.__closure__ or ():
+        _update(f, cell.cell_contents, seen)
+    _update_references(f, fun.__code__, fun.__globals__, seen)
+    digest = f.digest()
+    if fun.__closure__ is None:
+        _digests[fun] = digest
+    h.update(digest)
+
+
+def _update_class(h, cls, seen):
+    """Feed the source of `cls` and of everything its methods use into `h` (library classes by name)."""
+    if cls.__module__.split(".")[0] in LIBRARIES or cls in seen:
+        h.update(f"{cls.__module__}.{cls.__qualname__}".encode())
+        return
+    seen.add(cls)
+    if cls in _digests:
+        h.update(_digests[cls])
+        return
+
+    f = hashlib.sha256()
+    try:
+        f.update(inspect.getsource(cls).encode())
+    except (OSError, TypeError):
+        f.update(f"{cls.__module__}.{cls.__qualname__}".encode())
+    for value in vars(cls).values():
+        value = getattr(value, "__func__", getattr(value, "fget", value))  # classmethod, staticmethod, property
+        if isinstance(value, types.FunctionType):
+            _update_references(f, value.__code__, value.__globals__, seen)
+    _digests[cls] = f.digest()
+    h.update(_digests[cls])
+
+
+def _update_references(h, code, namespace, seen, modules=frozenset()):
+    """Feed the functions and classes that `code` uses through `namespace` (globals or a module) into `h`.
+
+    Names that refer to modules of the package are followed, so `kinetics.gk_table`
+    counts like a global `gk_table`.
+    """
+    for name in _names(code):
+        if isinstance(namespace, dict):
+            referenced = namespace.get(name)
+        else:
+            referenced = getattr(namespace, name, None)
+        if isinstance(referenced, types.ModuleType):
+            if referenced.__name__.split(".")[0] not in LIBRARIES and referenced not in modules:
+                _update_references(h, code, referenced, seen, modules | {referenced})
+        elif isinstance(referenced, (types.FunctionType, type)) or hasattr(referenced, "py_func") \
+                or hasattr(referenced, "__wrapped__"):
+            _update_function(h, referenced, seen)
+
+
+def _names(code):
+    """Global and attribute names used by `code` and the functions defined in it."""
+    names = list(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names.extend(_names(const))
+    return names
+
+
+default_cache = Cache(enabled=os.environ.get("MODELING_CACHE", "on").lower() not in {"off", "0", "false"})
+
+
+def solve_ivp(fun, t_span, y0, **options):
+    """`scipy.integrate.solve_ivp` with results cached on disk, see the module docstring."""
+    return default_cache.solve_ivp(fun, t_span, y0, **options)
+
+
+def cached_call(fun, *args, **kwargs):
+    """`fun(*args, **kwargs)` with the result cached on disk, see the module docstring."""
+    return default_cache.call(fun, *args, **kwargs)
@@ -0,0 +1,193 @@
+"""Pseudo-arclength continuation of steady states in one parameter.
+
+Starting from a steady state, `continuation` follows the branch of solutions of
+f(y, p) = 0 through the (y, p) space with a tangent predictor and a Newton
+corrector constrained to the hyperplane orthogonal to the tangent. Because the
+branch is parametrised by arclength rather than by `p`, it passes through folds
+and traces unstable branches, which a sweep in `p` cannot reach. The step size
+adapts to the number of corrector iterations, so flat parts of a branch are
+covered in a few large steps.
+
+Along the branch, the stability of every point is recorded and two kinds of
+special points are reported:
+
+- "LP" (limit point, saddle-node or fold): the parameter component of the
+  tangent changes sign.
+- "H" (Hopf): a pair of complex conjugate eigenvalues crosses the imaginary
+  axis.
+"""
+import numpy as np
+from scipy.optimize import OptimizeResult
+
+
+def finite_difference_jac(rhs, eps=1e-7):
+    """Jacobian of `rhs` by forward differences, for models without an analytic one."""
+    def jac(t, y, *args):
+        y = np.asarray(y, dtype=float)
+        f = np.asarray(rhs(t, y, *args), dtype=float)
+        J = np.empty((len(f), len(y)))
+        for i in range(len(y)):
+            dy = np.zeros_like(y)
+            dy[i] = eps * max(1, abs(y[i]))
+            J[:, i] = (np.asarray(rhs(t, y + dy, *args)) - f) / dy[i]
+        return J
+
+    return jac
+
+
+class _Problem:
+    """f(y, p) and its derivatives with the continuation parameter at `index`."""
+
+    def __init__(self, rhs, jac, p, index):
+        self.rhs, self.jac, self.p, self.index = rhs, jac, list(p), index
+
+    def args(self, lam):
+        args = list(self.p)
+        args[self.index] = lam
+        return args
+
+    def f(self, x):
+        return np.asarray(self.rhs(0, x[:-1], *self.args(x[-1])), dtype=float)
+
+    def f_y(self, x):
+        return np.asarray(self.jac(0, x[:-1], *self.args(x[-1])), dtype=float)
+
+    def f_p(self, x):
+        dx = np.zeros_like(x)
+        dx[-1] = 1e-7 * max(1, abs(x[-1]))
+        return (self.f(x + dx) - self.f(x - dx)) / (2 * dx[-1])
+
+    def full_jac(self, x):
+        return np.column_stack([self.f_y(x), self.f_p(x)])
+
+    def tangent(self, x, previous):
+        """Unit tangent at `x`, oriented like `previous`."""
+        A = np.vstack([self.full_jac(x), previous])
+        t = np.linalg.solve(A, np.r_[np.zeros(len(x) - 1), 1.0])
+        return t / np.linalg.norm(t)
+
+    def solve(self, x, tol, maxiter):
+        """Newton iteration in y at the fixed parameter `x[-1]`."""
+        x = np.array(x, dtype=float)
+        for _ in range(maxiter):
+            try:
+                dy = np.linalg.solve(self.f_y(x), -self.f(x))
+            except np.linalg.LinAlgError:
+                return None
+            x[:-1] += dy
+            if np.abs(dy).max() < tol and np.abs(self.f(x)).max() < tol:
+                return x
+        return None
+
+    def correct(self, x0, t0, ds, tol, maxiter):
+        """Newton corrector from the predictor `x0 + ds * t0` onto the branch."""
+        x = x0 + ds * t0
+        for nit in range(1, maxiter + 1):
+            G = np.r_[self.f(x), t0 @ (x - x0) - ds]
+            if not np.all(np.isfinite(G)):
+                return None, nit
+            try:
+                dx = np.linalg.solve(np.vstack([self.full_jac(x), t0]), -G)
+            except np.linalg.LinAlgError:
+                return None, nit
+            x = x + dx
+            if np.abs(dx).max() < tol and np.abs(self.f(x)).max() < tol:
+                return x, nit
+        return None, maxiter
+
+
+def continuation(rhs, y0, p, index=-1, jac=None, p_min=-np.inf, p_max=np.inf, direction=1,
+                 ds=0.01, ds_min=1e-6, ds_max=0.2, max_steps=2000, tol=1e-9, maxiter=8):
+    """Follow the steady-state branch of `rhs` through `y0` in the parameter `p[index]`.
+
+    `y0` only needs to be close to a steady state, it is refined by Newton at
+    fixed `p` first. The branch is followed in the direction of increasing
+    parameter for `direction=1` (decreasing for -1) until the parameter leaves
+    [`p_min`, `p_max`], `max_steps` is reached or the step falls below `ds_min`.
+    Without an analytic `jac`, finite differences are used.
+
+    Returns an `OptimizeResult` with the branch points `y` of shape (M, n), the
+    parameter values `p`, the eigenvalues `eigenvalues` of shape (M, n), a
+    `stable` mask and the list `special` of detected special points, each an
+    `OptimizeResult` with `kind` ("LP" or "H"), `y`, `p`, `index` (the branch
+    point just before it) and, for Hopf points, the angular frequency `omega`.
+    """
+    jac = finite_difference_jac(rhs) if jac is None else jac
+    problem = _Problem(rhs, jac, p, index)
+    x = problem.solve(np.r_[np.asarray(y0, dtype=float), p[index]], tol, 50)
+    if x is None:
+        raise RuntimeError("Starting point is not close to a steady state")
+
+    t = problem.tangent(x, np.r_[np.zeros(len(x) - 1), direction])
+    points, eigenvalues, special = [x], [np.linalg.eigvals(problem.f_y(x))], []
+
+    for _ in range(max_steps):
+        x_new, nit = problem.correct(x, t, ds, tol, maxiter)
+        if x_new is None:
+            ds /= 2
+            if ds < ds_min:
+                break
+            continue
+
+        t_new = problem.tangent(x_new, t)
+        ev_new = np.linalg.eigvals(problem.f_y(x_new))
+
+        if np.sign(t_new[-1]) != np.sign(t[-1]):
+            special.append(_locate_fold(problem, x, t, ds, t_new, tol, maxiter, len(points) - 1))
+        hopf = _hopf_crossing(eigenvalues[-1], ev_new)
+        if hopf is not None:
+            special.append(_locate_hopf(problem, x, x_new, *hopf, tol, maxiter, len(points) - 1))
+
+        x, t = x_new, t_new
+        points.append(x)
+        eigenvalues.append(ev_new)
+
+        if not p_min <= x[-1] <= p_max:
+            break
+        if nit <= 3:
+            ds = min(ds * 1.5, ds_max)
+        elif nit >= maxiter - 1:
+            ds = max(ds / 2, ds_min)
+
+    points, eigenvalues = np.array(points), np.array(eigenvalues)
+    return OptimizeResult(y=points[:, :-1], p=points[:, -1], eigenvalues=eigenvalues,
+                          stable=eigenvalues.real.max(axis=1) < 0, special=special)
+
+
+def _locate_fold(problem, x, t, ds, t_new, tol, maxiter, index):
+    """Secant iteration on the step length for the zero of the parameter tangent."""
+    a, fa, b, fb = 0.0, t[-1], ds, t_new[-1]
+    x_fold = x
+    for _ in range(20):
+        s = b - fb * (b - a) / (fb - fa)
+        x_s, _ = problem.correct(x, t, s, tol, maxiter)
+        if x_s is None:
+            break
+        x_fold = x_s
+        fs = problem.tangent(x_s, t)[-1]
+        if abs(fs) < 1e-8:
+            break
+        a, fa, b, fb = b, fb, s, fs
+    return OptimizeResult(kind="LP", y=x_fold[:-1], p=x_fold[-1], index=index)
+
+
+def _hopf_crossing(ev, ev_new):
+    """Real parts of the complex pair closest to the imaginary axis, if it changes sign."""
+    complex_old, complex_new = ev[np.abs(ev.imag) > 1e-12], ev_new[np.abs(ev_new.imag) > 1e-12]
+    if len(complex_old) == 0 or len(complex_new) == 0:
+        return None
+    re_old = complex_old.real[np.argmin(np.abs(complex_old.real))]
+    re_new = complex_new.real[np.argmin(np.abs(complex_new.real))]
+    if np.sign(re_old) == np.sign(re_new):
+        return None
+    return re_old, re_new
+
+
+def _locate_hopf(problem, x, x_new, re_old, re_new, tol, maxiter, index):
+    """Linear interpolation of the crossing, corrected back onto the branch at fixed parameter."""
+    x_h = x + re_old / (re_old - re_new) * (x_new - x)
+    corrected = problem.solve(x_h, tol, maxiter)
+    if corrected is not None:
+        x_h = corrected
+    ev = np.linalg.eigvals(problem.f_y(x_h))
+    return OptimizeResult(kind="H", y=x_h[:-1], p=x_h[-1], index=index, omega=np.abs(ev.imag).max())
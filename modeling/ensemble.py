@@ -0,0 +1,166 @@
+"""Lockstep integration of many trajectories of the same model.
+
+`integrate_ensemble` advances an ensemble of initial conditions of shape
+(n_traj, n) together with the Dormand-Prince 5(4) pair that `solve_ivp` uses by
+default (`RK45`). Every stage is one call of the column-wise right-hand side on
+the (n, n_active) stack of all unfinished trajectories, so the Python overhead
+is paid once per step for the whole ensemble instead of once per trajectory.
+
+Each trajectory keeps its own time, step size and error control: steps are
+accepted or rejected per trajectory, and trajectories that have reached the end
+of `t_span` are masked out of further right-hand side calls. Output at `t_eval`
+uses the same fourth-order dense output as `RK45`.
+
+The right-hand side receives the times of all active trajectories as an array,
+which the (autonomous) models of this repository ignore. Entries of `args` can
+be arrays with one value per trajectory, e.g. to integrate a whole parameter
+grid in one ensemble.
+"""
+import numpy as np
+from scipy.integrate import RK45
+from scipy.optimize import OptimizeResult
+
+from . import profiling
+
+SAFETY = 0.9
+MIN_FACTOR = 0.2
+MAX_FACTOR = 10
+
+
+def _combine(coefficients, K):
+    """sum_s coefficients[s] * K[s], elementwise so every trajectory is independent of the others."""
+    total = np.zeros(K.shape[1:])
+    for c, k in zip(coefficients, K):
+        if c != 0:
+            total += c * k
+    return total
+
+
+def _rms(x, scale):
+    return np.sqrt(np.mean((x / scale)**2, axis=1))
+
+
+def _initial_step(fun, t0, y0, f0, direction, rtol, atol):
+    """Vectorized version of the initial step selection of `solve_ivp`."""
+    scale = atol + np.abs(y0) * rtol
+    d0, d1 = _rms(y0, scale), _rms(f0, scale)
+    h0 = np.where((d0 < 1e-5) | (d1 < 1e-5), 1e-6, 0.01 * d0 / np.maximum(d1, 1e-300))
+    f1 = fun(t0 + direction * h0, y0 + direction * h0[:, None] * f0)
+    d2 = _rms(f1 - f0, scale) / h0
+    h1 = np.where(np.maximum(d1, d2) <= 1e-15, np.maximum(1e-6, h0 * 1e-3),
+                  (0.01 / np.maximum(np.maximum(d1, d2), 1e-300))**(1 / (RK45.error_estimator_order + 1)))
+    return np.minimum(100 * h0, h1)
+
+
+def integrate_ensemble(rhs, t_span, y0, args=(), t_eval=None, rtol=1e-3, atol=1e-6, max_step=np.inf,
+                       max_steps=100000):
+    """Integrate `rhs` from every row of `y0` (shape (n_traj, n)) over `t_span`.
+
+    `t_eval` has to be sorted in the direction of integration. Returns an
+    `OptimizeResult` with the final states `y_final` of shape
+    (n_traj, n), the solution `y` of shape (n_traj, n, len(t_eval)) at `t_eval`
+    (None without `t_eval`), the number of right-hand side calls `nfev` (each
+    on the whole active stack), the accepted and rejected steps per trajectory
+    (`n_accepted`, `n_rejected`) and the `success` mask of trajectories that
+    reached `t_span[1]` within `max_steps` steps. Trajectories that blow up or
+    whose step size collapses are dropped and keep NaN at the remaining `t_eval`.
+    """
+    A, B, C, E, P = RK45.A, RK45.B, RK45.C, RK45.E, RK45.P
+    error_exponent = -1 / (RK45.error_estimator_order + 1)
+    t0, t_end = map(float, t_span)
+    direction = np.sign(t_end - t0) if t_end != t0 else 1.0
+
+    started = profiling.start()
+    y = np.array(np.atleast_2d(y0), dtype=float)
+    n_traj, n = y.shape
+    nfev = 0
+
+    per_trajectory = [np.ndim(a) == 1 and len(a) == n_traj for a in args]
+    active_args = args
+
+    def fun(t, y):
+        nonlocal nfev
+        nfev += 1
+        return np.asarray(rhs(t, y.T, *active_args), dtype=float).T
+
+    t = np.full(n_traj, t0)
+    f = fun(t, y)
+    h = np.minimum(_initial_step(fun, t, y, f, direction, rtol, atol), max_step)
+
+    if t_eval is not None:
+        t_eval = np.asarray(t_eval, dtype=float)
+        y_eval = np.full((n_traj, n, len(t_eval)), np.nan)
+        at_start = t_eval == t0
+        y_eval[:, :, at_start] = y[:, :, None]
+
+    n_accepted = np.zeros(n_traj, dtype=int)
+    n_rejected = np.zeros(n_traj, dtype=int)
+    active = np.ones(n_traj, dtype=bool) if t_end != t0 else np.zeros(n_traj, dtype=bool)
+    K = np.empty((len(B) + 1, n_traj, n))
+
+    for _ in range(max_steps):
+        idx = np.flatnonzero(active)
+        if len(idx) == 0:
+            break
+
+        # Take a step on the active trajectories only:
+        if any(per_trajectory):
+            active_args = [np.asarray(a)[idx] if each else a for a, each in zip(args, per_trajectory)]
+        ti, yi, hi = t[idx], y[idx], np.minimum(h[idx], np.abs(t_end - t[idx]))
+        step = direction * hi
+        Ki = K[:, :len(idx)]
+        Ki[0] = f[idx]
+        for s in range(1, len(B)):
+            dy = _combine(A[s, :s], Ki[:s]) * step[:, None]
+            Ki[s] = fun(ti + C[s] * step, yi + dy)
+        y_new = yi + step[:, None] * _combine(B, Ki[:-1])
+        t_new = ti + step
+        f_new = fun(t_new, y_new)
+        Ki[-1] = f_new
+
+        # Error control per trajectory:
+        scale = atol + np.maximum(np.abs(yi), np.abs(y_new)) * rtol
+        error = _rms(step[:, None] * _combine(E, Ki), scale)
+        accept = error < 1
+        with np.errstate(divide="ignore"):
+            factor = np.where(error == 0, MAX_FACTOR, SAFETY * error**error_exponent)
+        factor = np.where(accept, np.clip(factor, MIN_FACTOR, MAX_FACTOR), np.clip(factor, MIN_FACTOR, 1))
+        h[idx] = np.minimum(hi * factor, max_step)
+
+        # Give up on trajectories whose step size collapses or that blow up:
+        failed = ~np.isfinite(error) | (hi < 10 * np.spacing(np.abs(ti)))
+        active[idx[failed & ~accept]] = False
+
+        acc = idx[accept]
+        n_accepted[acc] += 1
+        n_rejected[idx[~accept]] += 1
+
+        if t_eval is not None and len(acc):
+            _dense_output(t_eval, y_eval, acc, ti[accept], step[accept], yi[accept], Ki[:, accept], P, direction)
+
+        y[acc], f[acc] = y_new[accept], f_new[accept]
+        t[acc] = np.where(np.abs(t_end - t_new[accept]) <= 1e-12 * max(1, abs(t_end)), t_end, t_new[accept])
+        active[acc] = direction * (t_end - t[acc]) > 0
+
+    profiling.record("ensemble", args, started, method="RK45", status=int((t == t_end).all()), nfev=nfev,
+                     n_accepted=int(n_accepted.sum()), n_rejected=int(n_rejected.sum()))
+    return OptimizeResult(t=t_eval, y=y_eval if t_eval is not None else None, y_final=y, nfev=nfev,
+                          n_accepted=n_accepted, n_rejected=n_rejected, success=t == t_end)
+
+
+def _dense_output(t_eval, y_eval, idx, t, step, y, K, P, direction):
+    """Fill in the points of `t_eval` in (t, t + step] for the accepted steps of trajectories `idx`."""
+    s = direction * t_eval  # increasing
+    lo = np.searchsorted(s, direction * t, side="right")
+    hi = np.searchsorted(s, direction * (t + step), side="right")
+    counts = hi - lo
+    if not counts.any():
+        return
+
+    # One row per (trajectory, output time) pair:
+    rows = np.repeat(np.arange(len(idx)), counts)
+    points = lo[rows] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    x = (t_eval[points] - t[rows]) / step[rows]
+    powers = np.cumprod(np.repeat(x[:, None], P.shape[1], axis=1), axis=1)  # x, x^2, ...
+    Q = np.einsum("skn,sp->knp", K, P)  # (n_acc, n, order)
+    y_eval[idx[rows], :, points] = y[rows] + step[rows, None] * np.einsum("mnp,mp->mn", Q[rows], powers)
@@ -0,0 +1,161 @@
+"""Switching times, periods and convergence times from dense output, without sampling on a grid.
+
+`analyze` integrates a single trajectory step by step with one of the solvers
+of `solve_ivp` and locates events on the dense output of every step by root
+finding:
+
+- crossings of thresholds y_i = c, e.g. the time at which the switch turns on,
+- maxima and minima of one component (dy_i/dt = 0), which give the period and
+  the (peak-to-peak) amplitude of oscillations.
+
+It stops as soon as the trajectory has settled (max |dy/dt| below
+`settle_tol`) or locked onto a limit cycle (the last `cycles` periods and the
+states at the maxima agree within `cycle_rtol`), and records the time at which
+this happened. Only these scalars are kept, not the trajectory, so long scans
+that only need them (`analyze_scan`) neither integrate to the end of `t_span`
+nor store a time series.
+"""
+import multiprocessing
+
+import numpy as np
+from scipy.integrate import BDF, DOP853, LSODA, RK23, RK45, Radau
+from scipy.optimize import OptimizeResult, brentq
+
+from . import profiling
+from .solver import select_method
+
+METHODS = {"RK23": RK23, "RK45": RK45, "DOP853": DOP853, "Radau": Radau, "BDF": BDF, "LSODA": LSODA}
+IMPLICIT_METHODS = ("Radau", "BDF", "LSODA")
+
+
+def _root(g, t_old, t_new):
+    """Root of g in [t_old, t_new], where g changes sign."""
+    return brentq(g, t_old, t_new, xtol=1e-12 * max(1.0, abs(t_new)))
+
+
+def analyze(fun, t_span, y0, args=(), jac=None, method="auto", component=0, thresholds=(), settle_tol=1e-6,
+            cycle_rtol=1e-4, cycles=3, rtol=1e-6, atol=1e-9, **options):
+    """Integrate `fun` from `y0` until it settles or locks onto a cycle, and characterize the trajectory.
+
+    `thresholds` is a sequence of (index, value) pairs; extrema, period and
+    amplitude refer to `component`. `method="auto"` picks the method with
+    `modeling.solver.select_method`; extra `options` go to the solver.
+
+    Returns an `OptimizeResult` with
+
+    - `status`: "settled", "cycle" or "end" (reached `t_span[1]` first),
+    - `t_converged`: when it settled, or the first maximum of the locked cycle
+      (NaN for "end"), and the final time and state `t_final`, `y_final`,
+    - `crossings`: one array of crossing times per threshold, with the signs
+      of the crossings in `directions` (+1 upwards, -1 downwards),
+    - `t_max`, `y_max`, `t_min`, `y_min`: times and states of the extrema,
+    - `period`, `amplitude`: of the last full cycle (NaN and 0 once settled),
+    - `nfev`, `njev`, `nsteps`, `method`, `success` and `message`.
+    """
+    started = profiling.start()
+    t0, t_end = map(float, t_span)
+    y0 = np.asarray(y0, dtype=float)
+    if method == "auto":
+        method, _ = select_method(fun, t_span, y0, args, jac, rtol)
+    if jac is not None and method in IMPLICIT_METHODS:
+        options["jac"] = lambda t, y: jac(t, y, *args)
+    nfev = 0
+
+    def f(t, y):
+        nonlocal nfev
+        nfev += 1
+        return np.asarray(fun(t, y, *args), dtype=float)
+
+    solver = METHODS[method](f, t0, y0, t_end, rtol=rtol, atol=atol, **options)
+    levels = [y0[i] - c for i, c in thresholds]
+    crossings = [[] for _ in thresholds]
+    maxima, minima = [], []  # (t, y)
+    slope = f(t0, y0)
+    status, t_converged, nsteps, message = "end", np.nan, 0, None
+
+    while solver.status == "running":
+        t_old = solver.t
+        message = solver.step()
+        if solver.status == "failed":
+            break
+        nsteps += 1
+        t_new, sol = solver.t, solver.dense_output()
+        slope_old, slope = slope, f(t_new, solver.y)
+
+        for k, (i, c) in enumerate(thresholds):
+            level = solver.y[i] - c
+            if levels[k] * level < 0 or (level == 0 and levels[k] != 0):
+                crossings[k].append((_root(lambda s: sol(s)[i] - c, t_old, t_new), np.sign(level - levels[k])))
+            levels[k] = level
+
+        if slope_old[component] * slope[component] < 0:
+            t_e = _root(lambda s: f(s, sol(s))[component], t_old, t_new)
+            (maxima if slope_old[component] > 0 else minima).append((t_e, sol(t_e)))
+            if slope_old[component] > 0 and _locked(maxima, cycle_rtol, cycles):
+                status, t_converged = "cycle", maxima[-cycles - 1][0]
+                break
+
+        if np.abs(slope).max() < settle_tol:
+            g = lambda s: np.abs(f(s, sol(s))).max() - settle_tol
+            status, t_converged = "settled", _root(g, t_old, t_new) if g(t_old) > 0 else t_old
+            break
+
+    t_max, y_max = _unzip(maxima, len(y0))
+    t_min, y_min = _unzip(minima, len(y0))
+    period = t_max[-1] - t_max[-2] if len(t_max) >= 2 and status != "settled" else np.nan
+    amplitude = 0.0 if status == "settled" or not len(t_min) else \
+        y_max[-1, component] - y_min[-1, component]
+    profiling.record("events", args, started, method=method, status=status, nfev=nfev,
+                     njev=getattr(solver, "njev", 0), nlu=getattr(solver, "nlu", 0), n_accepted=nsteps)
+    return OptimizeResult(
+        status=status, t_converged=t_converged, t_final=solver.t, y_final=solver.y,
+        crossings=[np.array([t for t, _ in c]) for c in crossings],
+        directions=[np.array([d for _, d in c], dtype=int) for c in crossings],
+        t_max=t_max, y_max=y_max, t_min=t_min, y_min=y_min, period=period, amplitude=amplitude,
+        nfev=nfev, njev=getattr(solver, "njev", 0), nsteps=nsteps, method=method,
+        success=solver.status != "failed", message=message or "Settled, locked onto a cycle or reached the end.")
+
+
+def _locked(maxima, rtol, cycles):
+    """Whether the last `cycles` cycles between successive maxima repeat within `rtol`."""
+    if len(maxima) < cycles + 2:
+        return False
+    t, y = _unzip(maxima[-cycles - 2:], len(maxima[0][1]))
+    periods = np.diff(t)
+    return bool(np.all(np.abs(np.diff(periods)) <= rtol * periods[1:])
+                and np.all(np.abs(np.diff(y[1:], axis=0)).max(axis=1) <= rtol * np.abs(y[2:]).max(axis=1)))
+
+
+def _unzip(events, n):
+    if not events:
+        return np.empty(0), np.empty((0, n))
+    return np.array([t for t, _ in events]), np.array([y for _, y in events])
+
+
+def _analyze_point(task):
+    fun, point, y0, t_span, options = task
+    result = analyze(fun, t_span, y0, args=tuple(point), **options)
+    first = [c[0] if len(c) else np.nan for c in result.crossings]
+    return result.status, result.t_converged, result.period, result.amplitude, result.y_final, first
+
+
+def analyze_scan(fun, points, y0, t_span, processes=None, **options):
+    """`analyze` for every row of `points` (e.g. from `modeling.scan.parameter_grid`), on a process pool.
+
+    `processes=1` runs in this process. Returns an `OptimizeResult` with one
+    entry per point: `status`, `t_converged`, `period`, `amplitude`, `y_final`
+    and the time of the first crossing of every threshold, `t_first_crossing`
+    (shape (n_points, n_thresholds), NaN if it is never crossed).
+    """
+    points = np.asarray(points, dtype=float)
+    tasks = [(fun, point, y0, t_span, options) for point in points]
+    if processes == 1:
+        results = list(map(_analyze_point, tasks))
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(_analyze_point, tasks)
+
+    status, t_converged, period, amplitude, y_final, first = zip(*results) if results else [()] * 6
+    return OptimizeResult(status=np.array(status), t_converged=np.array(t_converged), period=np.array(period),
+                          amplitude=np.array(amplitude), y_final=np.array(y_final),
+                          t_first_crossing=np.array(first).reshape(len(points), -1))
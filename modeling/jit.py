@@ -0,0 +1,223 @@
+"""Optional compiled right-hand sides and Jacobians (numba).
+
+For the small models in this repository, the cost of a right-hand side call is
+dominated by the Python overhead of building a fresh `np.array([...])` from
+scalars. With numba installed, every model function has a compiled kernel that
+writes into a caller-provided array and allocates nothing:
+
+    kernel(y, p, out)
+
+with the state `y` of shape (n,), the parameter vector `p` of shape (n_params,)
+and `out` of shape (n,) for right-hand sides or (n, n) for Jacobians. The
+`columns` variant of each kernel takes stacked states of shape (n, N), one
+parameter column per state of shape (n_params, N) and writes into (n, N) or
+(n, n, N). Loops that call a model many times (Newton iterations, ensembles)
+can keep their own buffers and call the kernels directly.
+
+`compiled(fun)` wraps the kernels of a model function in the usual
+`fun(t, y, *args)` signature, so it is a drop-in replacement for `solve_ivp`,
+`modeling.steady_state` and `modeling.continuation`; `compiled(fun, *args)`
+binds the parameters once, which removes most of the remaining call overhead.
+Without numba, `compiled` returns the NumPy function (with bound parameters if
+given) and everything runs as before.
+"""
+import math
+
+import numpy as np
+
+from . import bistable, oscillators, switch
+
+try:
+    import numba
+except ImportError:  # numba is optional
+    numba = None
+
+HAVE_NUMBA = numba is not None
+
+
+def _njit(fun):
+    # Inlining lets `_columns` fuse the kernel into its loop instead of calling it per column.
+    return numba.njit(cache=True, inline="always")(fun) if HAVE_NUMBA else fun
+
+
+def _columns(kernel):
+    """Apply a single-state kernel to every column of stacked states."""
+    @_njit
+    def columns(y, p, out):
+        for j in range(y.shape[-1]):
+            kernel(y[..., j], p[..., j], out[..., j])
+
+    return columns
+
+
+# GOLDBETER-KOSHLAND FUNCTION
+@_njit
+def _gk(u_1, u_2, J_1, J_2):
+    # Same branches as `modeling.kinetics.goldbeter_koshland`, free of cancellation for B < 0.
+    a = u_2 - u_1
+    B = a + J_1 * u_2 + J_2 * u_1
+    root = math.sqrt(max(B**2 - 4 * a * u_1 * J_2, 0.0))
+    if B >= 0:
+        return 2 * u_1 * J_2 / (B + root)
+    return (B - root) / (2 * a)
+
+
+@_njit
+def _gk_du1(u_1, u_2, J_1, J_2):
+    a = u_2 - u_1
+    B = a + J_1 * u_2 + J_2 * u_1
+    G = _gk(u_1, u_2, J_1, J_2)
+    return (J_2 - (J_2 - 1) * G - G**2) / math.sqrt(B**2 - 4 * a * u_1 * J_2)
+
+
+# IRREVERSIBLE SWITCH
+@_njit
+def switch_rhs(y, p, out):
+    R, E = y[0], y[1]
+    k_0, k_1, k_2, k_3, k_4, K_M3, K_M4, E_T, S = p[0], p[1], p[2], p[3], p[4], p[5], p[6], p[7], p[8]
+    out[0] = k_0 * E + k_1 * S - k_2 * R
+    out[1] = k_3 * R * (E_T - E) / (K_M3 + E_T - E) - k_4 * E / (K_M4 + E)
+
+
+@_njit
+def switch_jac(y, p, out):
+    R, E = y[0], y[1]
+    k_0, k_2, k_3, k_4, K_M3, K_M4, E_T = p[0], p[2], p[3], p[4], p[5], p[6], p[7]
+    out[0, 0] = -k_2
+    out[0, 1] = k_0
+    out[1, 0] = k_3 * (E_T - E) / (K_M3 + E_T - E)
+    out[1, 1] = -k_3 * R * K_M3 / (K_M3 + E_T - E)**2 - k_4 * K_M4 / (K_M4 + E)**2
+
+
+@_njit
+def switch_gk_rhs(y, p, out):
+    k_0, k_1, k_2, k_3, k_4, K_M3, K_M4, E_T, S = p[0], p[1], p[2], p[3], p[4], p[5], p[6], p[7], p[8]
+    E_p = _gk(k_3 * y[0], k_4, K_M3 / E_T, K_M4 / E_T) * E_T
+    out[0] = k_0 * E_p + k_1 * S - k_2 * y[0]
+
+
+@_njit
+def switch_gk_jac(y, p, out):
+    k_0, k_2, k_3, k_4, K_M3, K_M4, E_T = p[0], p[2], p[3], p[4], p[5], p[6], p[7]
+    dE_p = _gk_du1(k_3 * y[0], k_4, K_M3 / E_T, K_M4 / E_T) * E_T * k_3
+    out[0, 0] = k_0 * dE_p - k_2
+
+
+# HYSTERETIC OSCILLATORS
+@_njit
+def sd_rhs(y, p, out):
+    X, R = y[0], y[1]
+    k_0_prime, k_0, k_1, k_2, k_3, k_4, J_3, J_4, S = p[0], p[1], p[2], p[3], p[4], p[5], p[6], p[7], p[8]
+    rate = k_0_prime + k_0 * _gk(k_3 * R, k_4, J_3, J_4)
+    out[0] = k_1 * S - X * rate
+    out[1] = X * rate - k_2 * R
+
+
+@_njit
+def sd_jac(y, p, out):
+    X, R = y[0], y[1]
+    k_0_prime, k_0, k_2, k_3, k_4, J_3, J_4 = p[0], p[1], p[3], p[4], p[5], p[6], p[7]
+    rate = k_0_prime + k_0 * _gk(k_3 * R, k_4, J_3, J_4)
+    d_rate = k_0 * _gk_du1(k_3 * R, k_4, J_3, J_4) * k_3
+    out[0, 0] = -rate
+    out[0, 1] = -X * d_rate
+    out[1, 0] = rate
+    out[1, 1] = X * d_rate - k_2
+
+
+@_njit
+def ai_rhs(y, p, out):
+    X, R = y[0], y[1]
+    k_2_prime, k_0, k_1, k_2, k_3, k_4, k_5, k_6 = p[0], p[1], p[2], p[3], p[4], p[5], p[6], p[7]
+    J_3, J_4, S = p[8], p[9], p[10]
+    out[0] = k_5 * R - k_6 * X
+    out[1] = k_1 * S + k_0 * _gk(k_3 * R, k_4, J_3, J_4) - R * (k_2 + k_2_prime * X)
+
+
+@_njit
+def ai_jac(y, p, out):
+    X, R = y[0], y[1]
+    k_2_prime, k_0, k_2, k_3, k_4, k_5, k_6, J_3, J_4 = p[0], p[1], p[3], p[4], p[5], p[6], p[7], p[8], p[9]
+    out[0, 0] = -k_6
+    out[0, 1] = k_5
+    out[1, 0] = -R * k_2_prime
+    out[1, 1] = k_0 * _gk_du1(k_3 * R, k_4, J_3, J_4) * k_3 - (k_2 + k_2_prime * X)
+
+
+# BISTABLE PHASE PLANE SYSTEM
+@_njit
+def bistable_rhs(y, p, out):
+    u, v, k = y[0], y[1], p[0]
+    out[0] = v - u
+    out[1] = u**2 / (k**2 + u**2) - v
+
+
+@_njit
+def bistable_jac(y, p, out):
+    u, k = y[0], p[0]
+    out[0, 0] = -1.0
+    out[0, 1] = 1.0
+    out[1, 0] = 2 * u * k**2 / (k**2 + u**2)**2
+    out[1, 1] = -1.0
+
+
+KERNELS = {
+    switch.ode: switch_rhs,
+    switch.jac: switch_jac,
+    switch.ode_gk: switch_gk_rhs,
+    switch.jac_gk: switch_gk_jac,
+    oscillators.ode_sd: sd_rhs,
+    oscillators.jac_sd: sd_jac,
+    oscillators.ode_ai: ai_rhs,
+    oscillators.jac_ai: ai_jac,
+    bistable.ode: bistable_rhs,
+    bistable.jac: bistable_jac,
+}
+COLUMN_KERNELS = {fun: _columns(kernel) for fun, kernel in KERNELS.items()}
+JACOBIANS = {switch.jac, switch.jac_gk, oscillators.jac_sd, oscillators.jac_ai, bistable.jac}
+
+
+def compiled(fun, *args):
+    """Compiled replacement for the model function `fun`, or `fun` itself without numba.
+
+    The replacement has the signature and output of `fun`, including stacked
+    states of shape (n, N) with scalar or per-column parameters. If `args` are
+    given, they are bound and the replacement takes `(t, y)` only.
+    """
+    if not HAVE_NUMBA:
+        return (lambda t, y: fun(t, y, *args)) if args else fun
+
+    kernel, columns = KERNELS[fun], COLUMN_KERNELS[fun]
+    is_jac = fun in JACOBIANS
+
+    def evaluate(y, p):
+        y = np.asarray(y, dtype=float)
+        n = y.shape[0]
+        if y.ndim == 1 and p.ndim == 1:
+            out = np.empty((n, n) if is_jac else n)
+            kernel(y, p, out)
+            return out
+
+        N = max(y.shape[-1] if y.ndim > 1 else 1, p.shape[-1] if p.ndim > 1 else 1)
+        y = np.broadcast_to(y.reshape(n, -1), (n, N))
+        p = np.broadcast_to(p.reshape(len(p), -1), (len(p), N))
+        out = np.empty((n, n, N) if is_jac else (n, N))
+        columns(y, p, out)
+        return out
+
+    if args:
+        p_bound = _parameters(args)
+        wrapped = lambda t, y: evaluate(y, p_bound)
+    else:
+        wrapped = lambda t, y, *args: evaluate(y, _parameters(args))
+    wrapped.__name__ = fun.__name__
+    wrapped.__doc__ = fun.__doc__
+    return wrapped
+
+
+def _parameters(args):
+    """Parameter vector (n_params,), or (n_params, N) if some parameters are arrays."""
+    try:
+        return np.array(args, dtype=float)
+    except ValueError:  # mix of scalars and arrays
+        return np.array(np.broadcast_arrays(*[np.asarray(a, dtype=float) for a in args]))
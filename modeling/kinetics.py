@@ -0,0 +1,70 @@
+"""Rate laws shared by several models."""
+import functools
+
+import numpy as np
+
+
+def goldbeter_koshland(u_1, u_2, J_1, J_2):
+    """Goldbeter-Koshland function, elementwise for arrays.
+
+    G is the root in [0, 1] of (u_2 - u_1) G^2 - B G + u_1 J_2 = 0 with
+    B = u_2 - u_1 + J_1 u_2 + J_2 u_1. The usual closed form
+    2 u_1 J_2 / (B + sqrt(B^2 - 4 (u_2 - u_1) u_1 J_2)) cancels catastrophically
+    for B < 0 (u_1 much larger than u_2 and small J), where the other form of
+    the quadratic formula, (B - sqrt(...)) / (2 (u_2 - u_1)), is used instead.
+    """
+    a = u_2 - u_1
+    B = a + J_1 * u_2 + J_2 * u_1
+    root = np.sqrt(np.maximum(B**2 - 4 * a * u_1 * J_2, 0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        G = np.where(B >= 0, 2 * u_1 * J_2 / (B + root), (B - root) / (2 * a))
+    return G[()]
+
+
+def goldbeter_koshland_du1(u_1, u_2, J_1, J_2):
+    """Derivative of `goldbeter_koshland` with respect to `u_1`.
+
+    Implicit differentiation of the quadratic gives
+    dG/du_1 = (J_2 - (J_2 - 1) G - G^2) / sqrt(B^2 - 4 (u_2 - u_1) u_1 J_2).
+    """
+    a = u_2 - u_1
+    B = a + J_1 * u_2 + J_2 * u_1
+    root = np.sqrt(B**2 - 4 * a * u_1 * J_2)
+    G = goldbeter_koshland(u_1, u_2, J_1, J_2)
+    return (J_2 - (J_2 - 1) * G - G**2) / root
+
+
+class GKTable:
+    """Interpolation table of `goldbeter_koshland` for fixed `J_1` and `J_2`.
+
+    G only depends on the ratio of `u_1` and `u_2`, so it is tabulated on a
+    uniform grid in s = u_1 / (u_1 + u_2), which maps [0, inf) to [0, 1]. The
+    grid is refined until the interpolation error at the interval midpoints is
+    below `tol` (or `max_points` is reached); the estimated error is stored in
+    `max_error`. Evaluation is a linear interpolation on the uniform grid.
+    """
+
+    def __init__(self, J_1, J_2, tol=1e-8, max_points=2**20 + 1):
+        self.J_1, self.J_2 = J_1, J_2
+        n = 257
+        while True:
+            s = np.linspace(0, 1, n)
+            G = goldbeter_koshland(s, 1 - s, J_1, J_2)
+            midpoints = (s[:-1] + s[1:]) / 2
+            max_error = np.abs(np.interp(midpoints, s, G) - goldbeter_koshland(midpoints, 1 - midpoints, J_1, J_2)).max()
+            if max_error <= tol or n >= max_points:
+                break
+            n = 2 * n - 1
+        self.s, self.G, self.dG, self.max_error = s, G, np.diff(G), max_error
+
+    def __call__(self, u_1, u_2):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x = np.clip(u_1 / (u_1 + u_2), 0, 1) * (len(self.s) - 1)
+        i = np.minimum(x.astype(int), len(self.s) - 2)  # uniform grid, no search needed
+        return (self.G[i] + (x - i) * self.dG[i])[()]
+
+
+@functools.lru_cache(maxsize=32)
+def gk_table(J_1, J_2, tol=1e-8):
+    """Cached `GKTable` for `J_1` and `J_2`, shared by all callers with the same values."""
+    return GKTable(J_1, J_2, tol)
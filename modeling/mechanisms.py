@@ -0,0 +1,31 @@
+"""Reaction mechanisms of the notebooks, compiled with `modeling.network`.
+
+The schemes follow `reaction_mechanisms/reaction_mechanisms.ipynb` (mechanisms
+A to F, all with mass-action kinetics) and
+`modeling_approximations/michaelis_menten.ipynb` (the full enzyme mechanism).
+Each network takes its rate constants in the order of its `parameters`, e.g.
+`solve_ivp(MECHANISM_B, t_span, y0, args=[k_1, k_m1])`.
+"""
+from .network import ReactionNetwork
+
+MECHANISM_A = ReactionNetwork(["A"], ["0 -> A : k_1", "A -> 0 : k_2"], "mechanism_A")
+MECHANISM_B = ReactionNetwork(["A", "B", "C"], ["A + B <-> C : k_1, k_m1"], "mechanism_B")
+MECHANISM_C = ReactionNetwork(["A", "C"], ["2 A -> C : k"], "mechanism_C")
+MECHANISM_D = ReactionNetwork(["A", "B", "C"], ["A + B -> A + C : k_1"], "mechanism_D")  # A catalyses B -> C
+MECHANISM_E = ReactionNetwork(["A", "AA", "AAA"], ["2 A <-> AA : k_1, k_m1", "A + AA <-> AAA : k_1, k_m1"],
+                              "mechanism_E")
+MECHANISM_F = ReactionNetwork(["S", "A", "A*", "B", "B*"], ["S + A -> S + A* : k_1", "A* + B -> A* + B* : k_2"],
+                              "mechanism_F")
+
+MICHAELIS_MENTEN = ReactionNetwork(["S", "E", "C", "P"], ["S + E <-> C : k_on, k_off", "C -> E + P : k_prod"],
+                                   "michaelis_menten")
+
+MECHANISMS = {
+    "A": MECHANISM_A,
+    "B": MECHANISM_B,
+    "C": MECHANISM_C,
+    "D": MECHANISM_D,
+    "E": MECHANISM_E,
+    "F": MECHANISM_F,
+    "Michaelis-Menten": MICHAELIS_MENTEN,
+}
@@ -0,0 +1,155 @@
+"""Mass-action reaction networks compiled into right-hand sides and Jacobians.
+
+A network is declared by its species and its reactions, written like the rate
+equation schemes of the notebooks:
+
+    network = ReactionNetwork(["A", "B", "C"], ["A + B <-> C : k_1, k_m1"])
+
+Each reaction is `reactants -> products : rate` (or `<->` with a forward and a
+backward rate); `0` or nothing stands for no species, `2 A` for `A + A`, and
+species that appear on both sides act as catalysts (e.g. `S + A -> S + A*`).
+With mass action, reaction j proceeds at
+
+    v_j = k_j * prod_i y_i^(R_ij)
+
+with the reactant orders R, and the right-hand side is dy/dt = N v with the
+stoichiometry matrix N (products minus reactants, species x reactions).
+
+The network is called like the other models, `network(t, y, *rates)`, with
+one argument per rate constant in the order of `network.parameters` (its
+signature lists them by name, so `modeling.scan.parameter_grid` works).
+States can be stacked as (n, N) and rate constants be arrays of length N to
+evaluate a batch of parameter sets at once. `network.jac` returns the analytic
+Jacobian in the dense layout of the other models, `network.sparse_jac` as a
+sparse matrix with the fixed pattern `network.sparsity`, which is what the
+implicit solvers of `solve_ivp` need for large networks
+(`jac=network.sparse_jac, jac_sparsity=network.sparsity`).
+"""
+import inspect
+import re
+
+import numpy as np
+from scipy import sparse
+
+_ARROW = re.compile(r"\s*(<->|->)\s*")
+
+
+def _side(text, species):
+    """Stoichiometric coefficients of one side of a reaction, e.g. "2 A + B"."""
+    coefficients = np.zeros(len(species), dtype=int)
+    for term in text.split("+"):
+        term = term.strip()
+        if term in ("", "0"):
+            continue
+        count, _, name = term.rpartition(" ")
+        if name not in species:
+            raise ValueError(f"Unknown species {name!r} in {text!r}")
+        coefficients[species.index(name)] += int(count) if count else 1
+    return coefficients
+
+
+def parse_reactions(species, reactions):
+    """Reactant and product matrices (n_reactions, n_species) and the rate names of `reactions`."""
+    reactants, products, rates = [], [], []
+    for reaction in reactions:
+        scheme, _, rate_names = reaction.partition(":")
+        left, arrow, right = _ARROW.split(scheme.strip())
+        names = [name.strip() for name in rate_names.split(",")]
+        if len(names) != (2 if arrow == "<->" else 1) or not all(names):
+            raise ValueError(f"{reaction!r} needs {'two rates' if arrow == '<->' else 'one rate'}")
+
+        lhs, rhs = _side(left, species), _side(right, species)
+        reactants.append(lhs), products.append(rhs), rates.append(names[0])
+        if arrow == "<->":
+            reactants.append(rhs), products.append(lhs), rates.append(names[1])
+    return np.array(reactants).reshape(-1, len(species)), np.array(products).reshape(-1, len(species)), rates
+
+
+class ReactionNetwork:
+    """Mass-action kinetics of `reactions` between `species`, see the module docstring."""
+
+    def __init__(self, species, reactions, name="network"):
+        self.species = list(species)
+        self.reactions = list(reactions)
+        self.__name__ = name
+        reactants, products, rates = parse_reactions(self.species, self.reactions)
+        n, m = len(self.species), len(rates)
+
+        self.parameters = list(dict.fromkeys(rates))  # unique, in order of appearance
+        self.rate_index = np.array([self.parameters.index(rate) for rate in rates], dtype=int)
+        self.stoichiometry = sparse.csr_matrix((products - reactants).T)  # N, (n_species, n_reactions)
+        self.orders = reactants  # R, (n_reactions, n_species)
+
+        # Reactants of every reaction, padded with index n (a constant 1) and order 0:
+        width = max(1, max(np.count_nonzero(row) for row in reactants) if m else 1)
+        self._species = np.full((m, width), n)
+        self._order = np.zeros((m, width), dtype=int)
+        for j, row in enumerate(reactants):
+            involved = np.flatnonzero(row)
+            self._species[j, :len(involved)] = involved
+            self._order[j, :len(involved)] = row[involved]
+
+        # d(N v)/dy as a linear map of the partial derivatives dv_j/dy_l at the reactant slots:
+        slot_reaction, slot = np.nonzero(self._order)
+        slot_species = self._species[slot_reaction, slot]
+        N = self.stoichiometry.tocsc()
+        rows, cols, slots, values = [], [], [], []
+        for e, (j, l) in enumerate(zip(slot_reaction, slot_species)):
+            column = N[:, j]
+            rows.extend(column.indices), cols.extend([l] * column.nnz)
+            slots.extend([e] * column.nnz), values.extend(column.data)
+        position = np.ravel_multi_index((np.array(rows, dtype=int), np.array(cols, dtype=int)), (n, n))
+        self._positions, inverse = np.unique(position, return_inverse=True)
+        self._assemble = sparse.csr_matrix((values, (inverse, slots)), shape=(len(self._positions), len(slot)))
+        self._slots = (slot_reaction, slot)
+        self.sparsity = sparse.csr_matrix((np.ones(len(self._positions)), np.unravel_index(self._positions, (n, n))),
+                                          shape=(n, n))
+
+        self.__signature__ = inspect.Signature(
+            [inspect.Parameter(name, inspect.Parameter.POSITIONAL_OR_KEYWORD) for name in ["t", "y", *self.parameters]])
+
+    def __repr__(self):
+        return f"ReactionNetwork({self.species!r}, {self.reactions!r})"
+
+    def _inputs(self, y, rates):
+        """Padded states (n + 1, N_y), rate constants per reaction (n_reactions, N_k) and the batch shape."""
+        if len(rates) != len(self.parameters):
+            raise TypeError(f"Expected rates {self.parameters}, got {len(rates)} values")
+        y = np.asarray(y, dtype=float)
+        k = np.array(np.broadcast_arrays(*[np.asarray(rate, dtype=float) for rate in rates]))[self.rate_index]
+        batch = () if y.ndim == 1 and k.ndim == 1 else (max(y.shape[-1] if y.ndim > 1 else 1, k.shape[-1]),)
+        y = y.reshape(len(y), -1)
+        return np.vstack([y, np.ones((1, y.shape[1]))]), k.reshape(len(k), -1), batch
+
+    def reaction_rates(self, y, *rates):
+        """Reaction rates v, shape (n_reactions,) or (n_reactions, N)."""
+        padded, k, batch = self._inputs(y, rates)
+        terms = padded[self._species] ** self._order[:, :, None]  # (n_reactions, width, N_y)
+        return (k * terms.prod(axis=1)).reshape(-1, *batch)
+
+    def __call__(self, t, y, *rates):
+        return self.stoichiometry @ self.reaction_rates(y, *rates)
+
+    def _partials(self, y, rates):
+        """dv_j/dy_l at every reactant slot (j, l), shape (n_slots,) or (n_slots, N)."""
+        padded, k, batch = self._inputs(y, rates)
+        j, s = self._slots
+        terms = padded[self._species[j]] ** self._order[j][:, :, None]  # (n_slots, width, N_y)
+        others = np.where((np.arange(terms.shape[1]) == s[:, None])[:, :, None], 1.0, terms).prod(axis=1)
+        order = self._order[j, s][:, None]
+        derivative = order * padded[self._species[j, s]] ** (order - 1)
+        return (k[j] * derivative * others).reshape(-1, *batch)
+
+    def jac(self, t, y, *rates):
+        """Dense Jacobian, shape (n, n) or (n, n, N) for stacked states."""
+        n = len(self.species)
+        values = self._assemble @ self._partials(y, rates)
+        J = np.zeros((n * n, *np.shape(values)[1:]))
+        J[self._positions] = values
+        return J.reshape((n, n, *np.shape(values)[1:]))
+
+    def sparse_jac(self, t, y, *rates):
+        """Jacobian of a single state as a `scipy.sparse.csr_matrix` with the pattern `sparsity`."""
+        n = len(self.species)
+        values = self._assemble @ self._partials(y, rates)
+        return sparse.csr_matrix((values, np.unravel_index(self._positions, (n, n))), shape=(n, n))
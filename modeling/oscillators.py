@@ -0,0 +1,76 @@
+"""Hysteretic oscillators: substrate-depletion (`ode_sd`) and activator-inhibitor (`ode_ai`).
+
+Both models act on the state (X, R) and, like `modeling.switch`, accept stacked
+states of shape (2, N). The parameter vectors keep the order of the scripts, so
+the signal `S` is the second-to-last entry (`S_INDEX`).
+
+`ode_sd_table` and `ode_ai_table` take the Goldbeter-Koshland function from
+the cached interpolation table `gk_table(J_3, J_4)` instead of evaluating it,
+for nullclines and vector fields on large grids. The integrators use the exact
+right-hand sides, whose Jacobians match them.
+"""
+import numpy as np
+
+from .kinetics import gk_table, goldbeter_koshland, goldbeter_koshland_du1
+
+
+def ode_sd(t, y, k_0_prime, k_0, k_1, k_2, k_3, k_4, J_3, J_4, S, E_T):
+    Ep_gk = goldbeter_koshland(k_3 * y[1], k_4, J_3, J_4)
+    dydt = np.array([
+        k_1 * S - y[0] * (k_0_prime + k_0 * Ep_gk),
+        y[0] * (k_0_prime + k_0 * Ep_gk) - k_2 * y[1]
+    ])
+    return dydt
+
+
+def ode_sd_table(t, y, k_0_prime, k_0, k_1, k_2, k_3, k_4, J_3, J_4, S, E_T):
+    """`ode_sd` with the Goldbeter-Koshland function interpolated from `gk_table`."""
+    Ep_gk = gk_table(J_3, J_4)(k_3 * y[1], k_4)
+    return np.array([
+        k_1 * S - y[0] * (k_0_prime + k_0 * Ep_gk),
+        y[0] * (k_0_prime + k_0 * Ep_gk) - k_2 * y[1]
+    ])
+
+
+def jac_sd(t, y, k_0_prime, k_0, k_1, k_2, k_3, k_4, J_3, J_4, S, E_T):
+    """Analytic Jacobian of `ode_sd`."""
+    Ep_gk = goldbeter_koshland(k_3 * y[1], k_4, J_3, J_4)
+    dEp_gk = goldbeter_koshland_du1(k_3 * y[1], k_4, J_3, J_4) * k_3
+    return np.array([
+        [-(k_0_prime + k_0 * Ep_gk), -y[0] * k_0 * dEp_gk],
+        [k_0_prime + k_0 * Ep_gk, y[0] * k_0 * dEp_gk - k_2]
+    ])
+
+
+def ode_ai(t, y, k_2_prime, k_0, k_1, k_2, k_3, k_4, k_5, k_6, J_3, J_4, S, E_T):
+    Ep_gk = goldbeter_koshland(k_3 * y[1], k_4, J_3, J_4)
+    dydt = np.array([
+        k_5 * y[1] - k_6 * y[0],
+        k_1 * S + k_0 * Ep_gk - y[1] * (k_2 + k_2_prime * y[0])
+    ])
+    return dydt
+
+
+def ode_ai_table(t, y, k_2_prime, k_0, k_1, k_2, k_3, k_4, k_5, k_6, J_3, J_4, S, E_T):
+    """`ode_ai` with the Goldbeter-Koshland function interpolated from `gk_table`."""
+    Ep_gk = gk_table(J_3, J_4)(k_3 * y[1], k_4)
+    return np.array([
+        k_5 * y[1] - k_6 * y[0],
+        k_1 * S + k_0 * Ep_gk - y[1] * (k_2 + k_2_prime * y[0])
+    ])
+
+
+def jac_ai(t, y, k_2_prime, k_0, k_1, k_2, k_3, k_4, k_5, k_6, J_3, J_4, S, E_T):
+    """Analytic Jacobian of `ode_ai`."""
+    dEp_gk = goldbeter_koshland_du1(k_3 * y[1], k_4, J_3, J_4) * k_3
+    zero = np.zeros_like(y[0] * y[1], dtype=float)
+    return np.array([
+        [zero - k_6, zero + k_5],
+        [-y[1] * k_2_prime, k_0 * dEp_gk - (k_2 + k_2_prime * y[0])]
+    ])
+
+
+# PARAMETER VALUES USED IN THE PHASE PLANE PROJECT
+PARAMS_SD = [0, 0.4, 1, 1, 1, 0.4, 0.5, 0.5, 0.2, 1]  # k_0_prime, k_0, k_1, k_2, k_3, k_4, J_3, J_4, S, E_T
+PARAMS_AI = [1, 4, 1, 1, 1, 1, 0.1, 0.075, 0.3, 0.3, 0.2, 1]  # k_2_prime, k_0, k_1, ..., k_6, J_3, J_4, S, E_T
+S_INDEX = -2  # position of the signal in both parameter vectors
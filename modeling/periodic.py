@@ -0,0 +1,179 @@
+"""Periodic orbits by shooting on a Poincaré section, with their Floquet multipliers.
+
+A limit cycle of period T through y_0 solves phi(T, y_0) = y_0 for the flow
+phi of the model. `periodic_orbit` solves this by Newton's method in (y_0, T),
+with the derivative of the flow (the monodromy matrix) from the variational
+equations dPhi/dt = J(y) Phi, integrated along with the trajectory. Since
+every point of the cycle is a solution, y_0 is restricted to a Poincaré
+section: the nullcline f_i(y_0) = 0 of one `component` i, i.e. y_0 is the
+maximum (or minimum) of y_i along the cycle. This anchors the orbit at the
+same place for every parameter value of a scan, unlike a fixed hyperplane.
+
+With `segments=m > 1` (multiple shooting) the cycle is split into m arcs of
+length T / m whose end points have to match the start of the next arc. Each
+arc is shorter, so strongly contracting or expanding cycles (relaxation
+oscillations) stay well conditioned.
+
+The eigenvalues of the monodromy matrix are the Floquet multipliers: one of
+them is 1 (the direction along the cycle), the cycle is stable if all others
+lie inside the unit circle. Only a guess of one cycle is needed, e.g. from
+`cycle_guess` once or from the previous point of a scan in
+`periodic_orbit_sweep`, so no transient has to be integrated per point.
+"""
+import numpy as np
+from scipy.optimize import OptimizeResult
+
+from .continuation import finite_difference_jac
+from .events import analyze
+from .solver import solve
+
+
+def _variational(fun, jac, n):
+    """Right-hand side of the state and the flattened n x n matrix Phi with dPhi/dt = J Phi."""
+    def rhs(t, z, *args):
+        y, Phi = z[:n], z[n:].reshape(n, n)
+        J = np.asarray(jac(t, y, *args), dtype=float)
+        return np.concatenate([np.asarray(fun(t, y, *args), dtype=float), (J @ Phi).ravel()])
+
+    return rhs
+
+
+def flow(fun, jac, y0, T, args=(), method="DOP853", rtol=1e-9, atol=1e-11, **options):
+    """State phi(T, y0) and monodromy matrix dphi/dy0 after time T."""
+    n = len(y0)
+    z0 = np.concatenate([np.asarray(y0, dtype=float), np.eye(n).ravel()])
+    result = solve(_variational(fun, jac, n), (0, T), z0, method=method, args=args, rtol=rtol, atol=atol,
+                   **options)
+    if not result.success:
+        raise RuntimeError(f"Integration of the variational equations failed: {result.message}")
+    z = result.y[:, -1]
+    return z[:n], z[n:].reshape(n, n)
+
+
+def cycle_guess(fun, y0, args=(), jac=None, component=0, t_end=1000, **options):
+    """Rough maximum of `component` on the limit cycle reached from `y0` and the period, from one transient."""
+    result = analyze(fun, (0, t_end), y0, args=args, jac=jac, component=component, cycle_rtol=1e-2, cycles=1,
+                     **options)
+    if len(result.t_max) < 2:
+        raise RuntimeError(f"No oscillation found from {y0} (trajectory {result.status})")
+    return result.y_max[-1], result.period
+
+
+def periodic_orbit(fun, y0, T, args=(), jac=None, component=0, segments=1, tol=1e-8, maxiter=30, n_points=200,
+                   **options):
+    """Periodic orbit of `fun` near the guess `y0` with period near `T`, by single or multiple shooting.
+
+    `y0` should be close to the maximum of `component` along the cycle (as
+    returned by `cycle_guess`). Newton stops when the update is below `tol`
+    relative to the state and the period. Extra `options` go to the
+    integration of the variational equations (e.g. `rtol`, `method`).
+
+    Returns an `OptimizeResult` with the point `y0` of the orbit on the
+    section, the `period`, the Floquet `multipliers` (sorted by
+    modulus, the trivial one included), `stable`, the starting points of the
+    arcs `nodes` of shape (segments, n), the orbit sampled at `n_points` times
+    `t`, `y` (shape (n, n_points)), the number of Newton iterations `nit`, the
+    final `residual` and `success` (False if Newton did not converge or the
+    orbit collapsed onto a steady state).
+    """
+    jac = finite_difference_jac(fun) if jac is None else jac
+    y0 = np.asarray(y0, dtype=float)
+    n, m = len(y0), segments
+
+    # Starting points of the arcs along the guessed orbit:
+    if m > 1:
+        guess = solve(fun, (0, T), y0, method="DOP853", args=args, t_eval=np.arange(m) * T / m, rtol=1e-9,
+                      atol=1e-11)
+        nodes = guess.y.T.copy()
+    else:
+        nodes = y0[None].copy()
+
+    success, residual = False, np.inf
+    for nit in range(1, maxiter + 1):
+        ends, monodromies = zip(*(flow(fun, jac, node, T / m, args, **options) for node in nodes))
+        G = np.concatenate([np.concatenate([ends[k] - nodes[(k + 1) % m] for k in range(m)]),
+                            [np.asarray(fun(0, nodes[0], *args), dtype=float)[component]]])
+        residual = np.abs(G).max()
+
+        A = np.zeros((m * n + 1, m * n + 1))
+        for k in range(m):
+            rows = slice(k * n, (k + 1) * n)
+            A[rows, k * n:(k + 1) * n] += monodromies[k]
+            A[rows, ((k + 1) % m) * n:((k + 1) % m + 1) * n] -= np.eye(n)
+            A[rows, -1] = np.asarray(fun(0, ends[k], *args), dtype=float) / m
+        A[-1, :n] = np.asarray(jac(0, nodes[0], *args), dtype=float)[component]
+        try:
+            dz = np.linalg.solve(A, -G)
+        except np.linalg.LinAlgError:
+            break
+        # Damped step: at most half the period and half the size of the state:
+        scale = max(np.abs(nodes).max(), 1.0)
+        damping = min(1.0, 0.5 * T / max(abs(dz[-1]), 1e-300), 0.5 * scale / max(np.abs(dz[:-1]).max(), 1e-300))
+        nodes = nodes + damping * dz[:-1].reshape(m, n)
+        T = T + damping * dz[-1]
+        if not np.all(np.isfinite(nodes)):
+            break
+        if np.abs(dz[:-1]).max() < tol * scale and abs(dz[-1]) < tol * T:
+            success = True  # the last update is negligible, so the monodromy matrices are still valid
+            break
+
+    M = np.linalg.multi_dot(monodromies[::-1]) if m > 1 else monodromies[0]
+    multipliers = np.linalg.eigvals(M)
+    multipliers = multipliers[np.argsort(-np.abs(multipliers))]
+    trivial = np.argmin(np.abs(multipliers - 1))
+    stable = bool(np.all(np.abs(np.delete(multipliers, trivial)) < 1))
+
+    t = np.linspace(0, T, n_points)
+    orbit = solve(fun, (0, T), nodes[0], method="DOP853", args=args, t_eval=t, rtol=1e-9, atol=1e-11)
+    success = success and np.ptp(orbit.y, axis=1).max() > 1e-6  # not collapsed onto the steady state
+    return OptimizeResult(y0=nodes[0], period=T, multipliers=multipliers, stable=stable, nodes=nodes, t=t,
+                          y=orbit.y, nit=nit, residual=residual, success=success)
+
+
+def limit_cycle(fun, y0, args=(), jac=None, component=0, **options):
+    """Limit cycle reached from `y0`: `periodic_orbit` started from `cycle_guess`."""
+    guess, T = cycle_guess(fun, y0, args=args, jac=jac, component=component)
+    return periodic_orbit(fun, guess, T, args=args, jac=jac, component=component, **options)
+
+
+def periodic_orbit_sweep(fun, y0, T, values, p, index=-1, jac=None, **options):
+    """Follow the periodic orbit through the guess (`y0`, `T`) along the parameter `p[index]` = `values`.
+
+    The guess for the next value is extrapolated from the last two orbits
+    (natural parameter continuation with a secant predictor). Extra `options`
+    go to `periodic_orbit`. Returns an `OptimizeResult` with one entry per
+    value: `period`, `amplitude` (max - min of every component, shape (N, n)),
+    `y0`, `multipliers` (shape (N, n)), `stable` and `success`. Points where
+    shooting fails (e.g. beyond the Hopf point, where the cycle collapses onto
+    the steady state) get NaN and do not update the guess.
+    """
+    values = np.atleast_1d(np.asarray(values, dtype=float))
+    y0 = np.asarray(y0, dtype=float)
+    n = len(y0)
+    period, amplitude = np.full(len(values), np.nan), np.full((len(values), n), np.nan)
+    points, multipliers = np.full((len(values), n), np.nan), np.full((len(values), n), np.nan, dtype=complex)
+    stable, success = np.zeros(len(values), dtype=bool), np.zeros(len(values), dtype=bool)
+
+    previous = []  # (value, y0, T) of the last two orbits, for a secant predictor
+    for i, value in enumerate(values):
+        args = list(p)
+        args[index] = value
+        guess_y0, guess_T = y0, T
+        if len(previous) == 2:
+            (v_1, y_1, T_1), (v_2, y_2, T_2) = previous
+            w = (value - v_2) / (v_2 - v_1)
+            guess_y0, guess_T = y_2 + w * (y_2 - y_1), T_2 + w * (T_2 - T_1)
+        try:
+            result = periodic_orbit(fun, guess_y0, guess_T, args=tuple(args), jac=jac, **options)
+        except RuntimeError:
+            result = None
+        if result is None or not result.success:
+            previous = []
+            continue
+        y0, T = result.y0, result.period
+        previous = (previous + [(value, y0, T)])[-2:]
+        period[i], amplitude[i], points[i] = T, np.ptp(result.y, axis=1), y0
+        multipliers[i], stable[i], success[i] = result.multipliers, result.stable, True
+
+    return OptimizeResult(period=period, amplitude=amplitude, y0=points, multipliers=multipliers, stable=stable,
+                          success=success)
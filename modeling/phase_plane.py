@@ -0,0 +1,144 @@
+"""Vector fields and nullclines of two-dimensional models on grids of any resolution.
+
+`vector_field` evaluates the right-hand side on the grid spanned by `x` and `y`
+(the first and second state variable) as one stacked call per tile of
+`tile` points. Large grids are split into tiles that are evaluated on a process
+pool, so 1000 x 1000 and larger fields stay cheap.
+
+`nullclines` finds the zero sets of both components of the right-hand side by
+marching squares: every grid cell whose corners change sign is subdivided
+`refine` times (only those cells, so the cost grows with the length of the
+nullcline rather than with the area) and the zero crossings on the fine cell
+edges are interpolated linearly. This needs no solving for one variable and
+no hand-picked domain: singular branches, e.g. the dX/dt nullcline of the
+substrate-depletion oscillator, which goes to infinity as R goes to 0, are
+simply cut off at the edge of the grid. Sign changes through poles are
+discarded by checking |f| at the end points of every segment.
+
+Both return plain arrays, so fields can be cached per parameter set with
+`modeling.cache.cached_call` and redrawn without evaluating them again.
+"""
+import multiprocessing
+
+import numpy as np
+
+
+def _evaluate(task):
+    fun, points, args = task
+    return np.asarray(fun(0, points, *args), dtype=float)
+
+
+def evaluate(fun, points, args=(), tile=250_000, processes=None):
+    """Right-hand side at `points` of shape (2, N), in tiles of `tile` points (on a pool if there are several)."""
+    tasks = [(fun, points[:, start:start + tile], args) for start in range(0, points.shape[1], tile)]
+    if processes == 1 or len(tasks) <= 1:
+        values = list(map(_evaluate, tasks))
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            values = pool.map(_evaluate, tasks)
+    return np.concatenate(values, axis=1) if values else np.empty((2, 0))
+
+
+def vector_field(fun, x, y, args=(), tile=250_000, processes=None):
+    """Vector field of `fun` on the grid of `x` and `y`.
+
+    Returns `X, Y, U, V, magnitude`, each of shape (len(y), len(x)) like
+    `np.meshgrid(x, y)`, ready for `quiver` or `streamplot`.
+    """
+    X, Y = np.meshgrid(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    U, V = evaluate(fun, np.stack([X.ravel(), Y.ravel()]), args, tile, processes).reshape(2, *X.shape)
+    return X, Y, U, V, np.sqrt(U**2 + V**2)
+
+
+def _crossing(x_0, x_1, f_0, f_1):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return x_0 + (x_1 - x_0) * f_0 / (f_0 - f_1)
+
+
+def marching_squares(F, x, y, return_cells=False):
+    """Zero-level segments of F (shape (..., len(y), len(x))) on the grids `x`, `y` (shape (..., len)).
+
+    Returns the segments as an array of shape (M, 2, 2): M segments of two
+    (x, y) points, e.g. for a `LineCollection`, and with `return_cells` the
+    flat index of the cell of every segment and the smaller |F| at the two
+    corners of the edge of every end point (shape (M, 2)).
+    """
+    a, b = F[..., :-1, :-1], F[..., :-1, 1:]  # corners (x_0, y_0), (x_1, y_0)
+    d, c = F[..., 1:, :-1], F[..., 1:, 1:]  # corners (x_0, y_1), (x_1, y_1)
+    shape = a.shape
+    x_0, x_1 = np.broadcast_to(x[..., None, :-1], shape), np.broadcast_to(x[..., None, 1:], shape)
+    y_0, y_1 = np.broadcast_to(y[..., :-1, None], shape), np.broadcast_to(y[..., 1:, None], shape)
+
+    # Crossing points on the edges: bottom (a-b), right (b-c), top (d-c), left (a-d):
+    edges = [
+        (np.signbit(a) != np.signbit(b), _crossing(x_0, x_1, a, b), y_0),
+        (np.signbit(b) != np.signbit(c), x_1, _crossing(y_0, y_1, b, c)),
+        (np.signbit(d) != np.signbit(c), _crossing(x_0, x_1, d, c), y_1),
+        (np.signbit(a) != np.signbit(d), x_0, _crossing(y_0, y_1, a, d)),
+    ]
+    cut = np.array([e[0] for e in edges])
+    points = np.array([np.stack([e[1], e[2]], axis=-1) for e in edges])  # (4, ..., 2)
+    scales = np.array([np.minimum(np.abs(f_0), np.abs(f_1)) for f_0, f_1 in ((a, b), (b, c), (d, c), (a, d))])
+    points = np.concatenate([points, scales[..., None]], axis=-1)  # carried along as a third coordinate
+    count = cut.sum(axis=0)
+
+    segments, cells = [], []
+    # Two cut edges: one segment between them.
+    two = count == 2
+    cells.append(np.flatnonzero(two))
+    first = np.argmax(cut, axis=0)
+    last = 3 - np.argmax(cut[::-1], axis=0)
+    segments.append(np.stack([np.take_along_axis(points, first[None, ..., None], 0)[0][two],
+                              np.take_along_axis(points, last[None, ..., None], 0)[0][two]], axis=1))
+    # Four cut edges (saddle): the sign at the center decides which corners are cut off.
+    four = count == 4
+    cells.extend([np.flatnonzero(four)] * 2)
+    center_like_a = np.signbit((a + b + c + d)[four]) == np.signbit(a[four])
+    p = points[:, four]
+    pairs = np.where(center_like_a[None, :, None, None],
+                     np.array([np.stack([p[0], p[1]], 1), np.stack([p[2], p[3]], 1)]),
+                     np.array([np.stack([p[3], p[0]], 1), np.stack([p[1], p[2]], 1)]))
+    segments.extend(pairs)
+    segments = np.concatenate(segments).reshape(-1, 2, 3)
+    if return_cells:
+        return segments[..., :2], np.concatenate(cells), segments[..., 2]
+    return segments[..., :2]
+
+
+def nullclines(fun, x, y, args=(), refine=8, tile=250_000, processes=None):
+    """Nullclines of `fun` on the grid of `x` and `y`, refined `refine` times in the cells they pass.
+
+    Returns a list with the segments (M_i, 2, 2) of the nullcline of every
+    component i (dx/dt = 0 first), see `marching_squares`.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    X, Y, U, V, _ = vector_field(fun, x, y, args, tile, processes)
+    cells = [_sign_change(F) for F in (U, V)]
+    rows, cols = np.nonzero(cells[0] | cells[1])
+
+    # Sub-grids of (refine + 1)^2 points in every cell that a nullcline passes:
+    s = np.linspace(0, 1, refine + 1)
+    x_fine = x[cols, None] + (x[cols + 1] - x[cols])[:, None] * s  # (k, refine + 1)
+    y_fine = y[rows, None] + (y[rows + 1] - y[rows])[:, None] * s
+    X_fine = np.broadcast_to(x_fine[:, None, :], (len(rows), refine + 1, refine + 1))
+    Y_fine = np.broadcast_to(y_fine[:, :, None], (len(rows), refine + 1, refine + 1))
+    values = evaluate(fun, np.stack([X_fine.ravel(), Y_fine.ravel()]), args, tile, processes)
+    values = values.reshape(2, len(rows), refine + 1, refine + 1)
+
+    result = []
+    for i in range(2):
+        F = values[i][cells[i][rows, cols]]
+        segments, _, scales = marching_squares(F, x_fine[cells[i][rows, cols]], y_fine[cells[i][rows, cols]],
+                                               return_cells=True)
+        # Close to a zero, |f| at an interpolated crossing is much smaller than at both corners of its edge. At
+        # a sign change through a pole c / (x - x_0) it is at least as large as at the nearer corner:
+        ends = np.abs(evaluate(fun, segments.reshape(-1, 2).T, args, tile, processes)[i]).reshape(-1, 2)
+        result.append(segments[np.all(ends <= 0.5 * scales, axis=1)])
+    return result
+
+
+def _sign_change(F):
+    """Cells (len(y) - 1, len(x) - 1) whose corners do not all have the same sign."""
+    corners = np.signbit(np.stack([F[:-1, :-1], F[:-1, 1:], F[1:, :-1], F[1:, 1:]]))
+    return corners.any(axis=0) & ~corners.all(axis=0)
+
@@ -0,0 +1,43 @@
+"""Phase portraits for the animation scripts, drawn from the results of the compute modules.
+
+The models, solvers and sweeps of the package only need NumPy and SciPy, so
+worker processes of scans and notebooks that only integrate never load
+matplotlib. The figures are built here from the plain arrays these modules
+return: vector fields and nullclines from `modeling.phase_plane` and
+ensembles of trajectories from `modeling.ensemble`. Together with
+`modeling.animation`, this is the plotting layer of the package: the only
+modules that import matplotlib, and `import modeling` loads neither of them
+until they are used.
+"""
+from matplotlib.collections import LineCollection
+
+
+def draw_vector_field(ax, field, scale=30, cmap="viridis_r", alpha=0.6, label="vector field"):
+    """Quiver plot of a `modeling.phase_plane.vector_field` result, colored by the magnitude."""
+    X, Y, U, V, magnitude = field
+    return ax.quiver(X, Y, U, V, magnitude, scale=scale, cmap=cmap, alpha=alpha, label=label)
+
+
+def draw_nullclines(ax, segments, labels, colors=("tab:blue", "tab:orange")):
+    """One `LineCollection` per nullcline from the segments of `modeling.phase_plane.nullclines`."""
+    return [ax.add_collection(LineCollection(s, colors=color, label=label))
+            for s, label, color in zip(segments, labels, colors)]
+
+
+class Trajectories:
+    """Trajectories `y` of shape (n_traj, 2, n_t) revealed frame by frame, as two artists in total.
+
+    All dashed lines share one `LineCollection` and all current positions one
+    line of markers, so an animation can blit them (`update` returns both).
+    """
+
+    def __init__(self, ax, y, label="trajectories"):
+        self.y = y
+        self.lines = ax.add_collection(LineCollection([], colors="black", linestyles="dashed", alpha=0.7,
+                                                      label=label))
+        self.dots, = ax.plot([], [], linestyle="", marker="o", color="tab:red")
+
+    def update(self, frame):
+        self.lines.set_segments(self.y[:, :, :frame].transpose(0, 2, 1))  # (n_traj, frame, 2)
+        self.dots.set_data(self.y[:, 0, frame], self.y[:, 1, frame])
+        return self.lines, self.dots
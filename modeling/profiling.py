@@ -0,0 +1,198 @@
+"""Solver instrumentation: right-hand side calls, steps and wall time per solve, aggregated per sweep.
+
+Profiling is off by default, and then every solver call of the package costs
+one extra list lookup. Inside `with profile() as prof:`, or for a whole
+script with the environment variable `MODELING_PROFILE=on` (which prints the
+report when the script exits), every solver call adds a record to the
+profile with
+
+- `kind`: "solve" (`modeling.solver.solve`), "probe" (its explicit probe
+  for the stiffness), "sweep_batch", "steady_state" (the Newton iteration),
+  "ensemble" or "events" (`modeling.events.analyze`),
+- `params`: the parameter point, i.e. the `args` of the call (array-valued
+  entries, like the signal of a batch, are kept as arrays),
+- `method`, `status`, the counts `nfev`, `njev`, `nlu`, `n_accepted` and
+  `n_rejected`, and the `wall` time in seconds.
+
+Accepted steps are counted for every method, rejected ones only where they
+follow from the right-hand side calls of a step (the explicit Runge-Kutta
+methods); they are None otherwise. Records of calls made inside another
+recorded call (the integration fallback of `steady_state`) have a larger
+`depth`; their wall time is part of that of the outer record.
+
+`Profile.summary` totals the records per kind, `Profile.by_parameter` per
+value of one parameter (the signal, last in the switch models), which shows
+the regions of parameter space where a sweep spends its time, e.g. the slow
+passage near the fold of the switch.
+"""
+import atexit
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from scipy.optimize import OptimizeResult
+
+COUNTS = ("nfev", "njev", "nlu", "n_accepted", "n_rejected")
+
+_active = []  # stack of the profiles that record, innermost last
+_depth = 0
+
+
+class Profile:
+    """Records of the solver calls made while the profile is active, see the module docstring."""
+
+    def __init__(self):
+        self.records = []
+
+    def summary(self):
+        """Number of calls, total counts and wall time per kind (nested calls count for their outer kind too)."""
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record["kind"], dict(calls=0, wall=0.0, **{key: 0 for key in COUNTS}))
+            total["calls"] += 1
+            total["wall"] += record["wall"]
+            for key in COUNTS:
+                total[key] += record.get(key) or 0
+        return totals
+
+    def by_parameter(self, index=-1, kind=None):
+        """Totals per value of the parameter `params[index]`, over the records of `kind` (all by default).
+
+        The counts and the wall time of a record with an array of values (a
+        batch) are split evenly among them. Returns an `OptimizeResult` with the
+        sorted values `parameter` and, per value, `calls`, `wall` and the totals
+        of `COUNTS`.
+        """
+        rows = {}
+        for record in self.records:
+            if (kind is not None and record["kind"] != kind) or len(record["params"]) == 0:
+                continue
+            values = np.atleast_1d(record["params"][index])
+            for value in values:
+                row = rows.setdefault(float(value), dict(calls=0, wall=0.0, **{key: 0.0 for key in COUNTS}))
+                row["calls"] += 1
+                row["wall"] += record["wall"] / len(values) if record["depth"] == 0 else 0.0
+                for key in COUNTS:
+                    row[key] += (record.get(key) or 0) / len(values)
+        values = np.array(sorted(rows))
+        return OptimizeResult(parameter=values, **{key: np.array([rows[v][key] for v in values])
+                                                   for key in ("calls", "wall") + COUNTS})
+
+    def report(self, index=-1, top=10):
+        """Text table of `summary` and of the `top` most expensive values of `params[index]`."""
+        lines = [f"{'kind':<14}{'calls':>8}{'nfev':>10}{'njev':>8}{'accepted':>10}{'rejected':>10}{'wall [s]':>10}"]
+        for kind, total in self.summary().items():
+            lines.append(f"{kind:<14}{total['calls']:>8}{total['nfev']:>10}{total['njev']:>8}"
+                         f"{total['n_accepted']:>10}{total['n_rejected']:>10}{total['wall']:>10.3f}")
+        points = self.by_parameter(index)
+        if len(points.parameter):
+            lines.append(f"\nmost expensive values of params[{index}]:")
+            lines.append(f"{'value':>14}{'calls':>8}{'nfev':>10}{'wall [s]':>10}")
+            for i in np.argsort(-points.wall)[:top]:
+                lines.append(f"{points.parameter[i]:>14.6g}{points.calls[i]:>8}{points.nfev[i]:>10.0f}"
+                             f"{points.wall[i]:>10.3f}")
+        return "\n".join(lines)
+
+
+def enabled():
+    """Whether a profile is recording."""
+    return bool(_active)
+
+
+@contextmanager
+def profile():
+    """Record the solver calls in the body into a new `Profile`."""
+    prof = Profile()
+    _active.append(prof)
+    try:
+        yield prof
+    finally:
+        _active.remove(prof)
+
+
+@contextmanager
+def measure(kind, params=()):
+    """Record the call in the body, with the counts the body puts into the yielded dict (None if off)."""
+    global _depth
+    if not _active:
+        yield None
+        return
+    record = {"kind": kind, "params": _params(params), "depth": _depth}
+    _depth += 1
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        _depth -= 1
+        _append(record, start)
+
+
+def start():
+    """Start time for `record` if a profile is recording, else None."""
+    return time.perf_counter() if _active else None
+
+
+def record(kind, params, started, **counts):
+    """Record a call that began at `started` (from `start`) with its `counts`; nothing if `started` is None."""
+    if started is not None:
+        _append(dict(kind=kind, params=_params(params), depth=_depth, **counts), started)
+
+
+def _params(params):
+    return tuple(np.array(a) if np.ndim(a) else float(a) for a in params)
+
+
+def _append(record, started):
+    record["wall"] = time.perf_counter() - started
+    for prof in _active:
+        prof.records.append(record)
+
+
+def _counting(method):
+    """Subclass of the `solve_ivp` method that counts accepted (and where possible rejected) steps."""
+    from .events import METHODS
+
+    base = METHODS[method] if isinstance(method, str) else method
+
+    class Counting(base):
+        instances = []
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.n_accepted, self.n_attempts = 0, 0
+            Counting.instances.append(self)
+
+        def step(self):
+            nfev = self.nfev
+            message = super().step()
+            if self.status != "failed":
+                self.n_accepted += 1
+            if hasattr(self, "n_stages"):  # explicit Runge-Kutta: n_stages calls per attempted step
+                self.n_attempts += (self.nfev - nfev) // self.n_stages
+            return message
+
+    return Counting
+
+
+def solve_ivp(fun, t_span, y0, method="RK45", kind="solve", params=None, **options):
+    """`scipy.integrate.solve_ivp`, recorded as `kind` with the parameter point `params` (the `args`)."""
+    from scipy import integrate
+
+    if not _active:
+        return integrate.solve_ivp(fun, t_span, y0, method=method, **options)
+    params = (options.get("args") or ()) if params is None else params
+    with measure(kind, params) as record:
+        counting = _counting(method)
+        result = integrate.solve_ivp(fun, t_span, y0, method=counting, **options)
+        solver = counting.instances[-1]
+        record.update(method=method if isinstance(method, str) else method.__name__, status=result.status,
+                      nfev=result.nfev, njev=result.njev, nlu=result.nlu, n_accepted=solver.n_accepted,
+                      n_rejected=solver.n_attempts - solver.n_accepted if hasattr(solver, "n_stages") else None)
+    return result
+
+
+if os.environ.get("MODELING_PROFILE", "off").lower() in {"on", "1", "true"}:
+    _script_profile = Profile()
+    _active.append(_script_profile)
+    atexit.register(lambda: print(_script_profile.report()))
@@ -0,0 +1,179 @@
+"""Adaptive quasi-steady-state (QSS) reduction: integrate the reduced model where it is valid.
+
+A QSS reduction replaces the fast variables of a model by their quasi-steady
+state as a function of the slow ones, e.g. E* of the switch by the
+Goldbeter-Koshland function of R (`ode_gk`) or the enzyme complex C by the
+Michaelis-Menten expression. Its error has two parts, both estimated to first
+order by the `error` function of a `Reduction`:
+
+- the fast variables lag behind their quasi-steady state, by about
+  |d(fast_qss)/dt| / lambda_fast with the relaxation rate lambda_fast of the
+  fast subsystem, i.e. they must be much faster than their quasi-steady state
+  moves,
+- this lag perturbs the slow right-hand side by |d(f_slow)/d(fast)| * lag, and
+  the slow variables accumulate the perturbation to about perturbation /
+  (-lambda_slow), with the largest eigenvalue lambda_slow of the reduced
+  Jacobian. Where lambda_slow is not clearly negative, e.g. where the switch
+  passes its fold and jumps to the upper branch, small perturbations are not
+  damped (they shift the time of the jump) and the reduction is not trusted.
+
+`integrate_reduced` starts with the full model and switches to the reduced
+model when the distance of the fast variables from their quasi-steady state
+and the estimated error are both below `tol / 2`. It switches back to the full
+model, lifting the state onto the quasi-steady state, when the estimated error
+exceeds `tol`, e.g. after a jump of the signal or close to the fold. Both
+switches are located exactly with terminal events.
+"""
+import numpy as np
+from scipy.optimize import OptimizeResult
+
+from . import switch
+from .kinetics import goldbeter_koshland, goldbeter_koshland_du1
+from .mechanisms import MICHAELIS_MENTEN
+from .solver import solve
+
+
+class Reduction:
+    """A full model, its QSS reduction and the error estimate of the reduction.
+
+    `full(t, y, *args)` and `reduced(t, x, *args)` are the right-hand sides,
+    `project(y)` maps full states to slow states x, `lift(x, *args)` slow
+    states to full states on the quasi-steady state, and `error(x, *args)` is
+    the estimated error of the reduced model at x (see the module docstring).
+    """
+
+    def __init__(self, full, reduced, project, lift, error, full_jac=None, reduced_jac=None):
+        self.full, self.reduced = full, reduced
+        self.project, self.lift, self.error = project, lift, error
+        self.full_jac, self.reduced_jac = full_jac, reduced_jac
+
+    def distance(self, y, *args):
+        """Largest distance of the full state `y` from the quasi-steady state."""
+        return np.abs(y - self.lift(self.project(y), *args)).max(axis=0)
+
+
+def integrate_reduced(reduction, t_span, y0, args=(), t_eval=None, tol=1e-3, max_switches=1000, **options):
+    """Integrate the full model of `reduction`, replaced by the reduced model where its error is below `tol`.
+
+    Returns an `OptimizeResult` with `t` and the full states `y` at `t_eval`
+    (101 points by default), the mask `reduced` of the output times covered by
+    the reduced model, the estimated `error` at every output time (zero where
+    the full model is integrated) and its maximum `max_error`, the `switches`
+    as (time, model) pairs, the number of right-hand side calls per model
+    (`nfev_full`, `nfev_reduced`) and the final full state `y_final`. If the
+    models switch more than `max_switches` times (chattering close to the
+    boundary of validity), the output stops at the last switch and `success`
+    is False, with the reason in `message`. Extra `options` go to
+    `modeling.solver.solve` (e.g. `method`, `rtol`).
+    """
+    y = np.asarray(y0, dtype=float)
+    t0, t_end = map(float, t_span)
+    t_eval = np.linspace(t0, t_end, 101) if t_eval is None else np.asarray(t_eval, dtype=float)
+
+    def enter_reduced(t, y, *args):  # full -> reduced, crossing downwards
+        return max(reduction.distance(y, *args), reduction.error(reduction.project(y), *args)) - tol / 2
+
+    def leave_reduced(t, x, *args):  # reduced -> full, crossing upwards
+        return reduction.error(x, *args) - tol
+
+    enter_reduced.terminal, enter_reduced.direction = True, -1
+    leave_reduced.terminal, leave_reduced.direction = True, 1
+
+    t, reduced = t0, enter_reduced(t0, y, *args) < 0
+    ts, ys, modes, switches = [], [], [], []
+    nfev = {False: 0, True: 0}
+    for _ in range(max_switches + 1):
+        pending = t_eval[t_eval > t] if ts else t_eval[t_eval >= t0]
+        if reduced:
+            result = solve(reduction.reduced, (t, t_end), reduction.project(y), args=args,
+                           jac=reduction.reduced_jac, t_eval=pending, events=leave_reduced, **options)
+            y_out = reduction.lift(result.y, *args)
+            y = reduction.lift(result.y_events[0][0] if result.status == 1 else result.y[:, -1], *args)
+        else:
+            result = solve(reduction.full, (t, t_end), y, args=args, jac=reduction.full_jac, t_eval=pending,
+                           events=enter_reduced, **options)
+            y_out = result.y
+            y = result.y_events[0][0] if result.status == 1 else result.y[:, -1]
+        if result.status < 0:
+            raise RuntimeError(result.message)
+        nfev[reduced] += result.nfev
+        ts.append(result.t), ys.append(y_out), modes.append(np.full(len(result.t), reduced))
+
+        if result.status != 1:
+            success, message = True, "Reached the end of the time span."
+            break
+        t, reduced = result.t_events[0][0], not reduced
+        switches.append((t, "reduced" if reduced else "full"))
+    else:
+        success, message = False, f"Stopped at t = {t:g} after {len(switches)} switches between the models."
+
+    y_eval, reduced_mask = np.concatenate(ys, axis=1), np.concatenate(modes)
+    error = np.where(reduced_mask, reduction.error(reduction.project(y_eval), *args), 0.0)
+    return OptimizeResult(t=np.concatenate(ts), y=y_eval, y_final=y, reduced=reduced_mask, error=error,
+                          max_error=error.max(initial=0.0), switches=switches, nfev_full=nfev[False],
+                          nfev_reduced=nfev[True], success=success, message=message)
+
+
+def _slow_error(coupling, lag, lambda_slow):
+    """Accumulated error of the slow variables, unbounded where lambda_slow is not negative."""
+    return np.abs(coupling * lag) / np.maximum(-lambda_slow, 1e-12)
+
+
+# IRREVERSIBLE SWITCH: E* IN QUASI-STEADY STATE (GOLDBETER-KOSHLAND), REDUCED MODEL `ode_gk`
+def _switch_lift(x, k_0, k_1, k_2, k_3, k_4, K_M3, K_M4, E_T, S):
+    R = np.asarray(x, dtype=float)[0]
+    return np.array([R, goldbeter_koshland(k_3 * R, k_4, K_M3 / E_T, K_M4 / E_T) * E_T])
+
+
+def _switch_error(x, k_0, k_1, k_2, k_3, k_4, K_M3, K_M4, E_T, S):
+    R, E = _switch_lift(x, k_0, k_1, k_2, k_3, k_4, K_M3, K_M4, E_T, S)
+    dE_dR = goldbeter_koshland_du1(k_3 * R, k_4, K_M3 / E_T, K_M4 / E_T) * E_T * k_3
+    lambda_fast = k_3 * R * K_M3 / (K_M3 + E_T - E)**2 + k_4 * K_M4 / (K_M4 + E)**2  # -d(dE*/dt)/dE*
+    lag = np.abs(dE_dR * (k_0 * E + k_1 * S - k_2 * R)) / lambda_fast
+    return np.maximum(lag, _slow_error(k_0, lag, k_0 * dE_dR - k_2))
+
+
+SWITCH = Reduction(switch.ode, switch.ode_gk, lambda y: np.asarray(y)[:1], _switch_lift, _switch_error,
+                   switch.jac, switch.jac_gk)
+
+
+# MICHAELIS-MENTEN: COMPLEX IN QUASI-STEADY STATE
+def michaelis_menten(E_T):
+    """Reduction of `modeling.mechanisms.MICHAELIS_MENTEN` (S, E, C, P) with total enzyme `E_T`.
+
+    The slow variables are the total substrate S_T = S + C and P, so the
+    reduction conserves mass. The complex follows from the quadratic quasi-steady
+    state condition k_on (S_T - C) (E_T - C) = (k_off + k_prod) C (the "total"
+    QSS approximation), which is the Michaelis-Menten expression
+    C = E_T S_T / (K_m + S_T) when E_T << S_T + K_m and stays accurate otherwise.
+    """
+    def complex_qss(S_T, k_on, k_off, k_prod):
+        b = S_T + E_T + (k_off + k_prod) / k_on
+        return 2 * E_T * S_T / (b + np.sqrt(b**2 - 4 * E_T * S_T)), b
+
+    def project(y):
+        y = np.asarray(y, dtype=float)
+        return np.array([y[0] + y[2], y[3]])
+
+    def lift(x, k_on, k_off, k_prod):
+        C, _ = complex_qss(x[0], k_on, k_off, k_prod)
+        return np.array([x[0] - C, E_T - C, C, x[1]])
+
+    def reduced(t, x, k_on, k_off, k_prod):
+        rate = k_prod * complex_qss(x[0], k_on, k_off, k_prod)[0]
+        return np.array([-rate, rate])
+
+    def reduced_jac(t, x, k_on, k_off, k_prod):
+        C, b = complex_qss(x[0], k_on, k_off, k_prod)
+        dC = (E_T - C) / (b - 2 * C)
+        zero = np.zeros_like(dC)
+        return np.array([[-k_prod * dC, zero], [k_prod * dC, zero]])
+
+    def error(x, k_on, k_off, k_prod):
+        C, b = complex_qss(x[0], k_on, k_off, k_prod)
+        dC_dS_T = (E_T - C) / (b - 2 * C)
+        lambda_fast = k_on * (b - 2 * C)  # -d(dC/dt)/dC = k_on (S + E) + k_off + k_prod
+        lag = np.abs(dC_dS_T * k_prod * C) / lambda_fast
+        return np.maximum(lag, _slow_error(k_prod, lag, -k_prod * dC_dS_T))  # P carries no error of its own
+
+    return Reduction(MICHAELIS_MENTEN, reduced, project, lift, error, MICHAELIS_MENTEN.jac, reduced_jac)
@@ -0,0 +1,147 @@
+"""Parameter scans spread over a process pool.
+
+A scan integrates a model for every row of a parameter matrix of shape
+(n_points, n_params), e.g. built with `parameter_grid`. The rows are split into
+chunks of `chunk_size` consecutive points; every chunk is integrated as one
+ensemble (`modeling.ensemble.integrate_ensemble`, with one parameter value per
+trajectory) in a worker process, and the chunks are streamed back in order.
+
+Since every trajectory of an ensemble has its own step size control, the result
+for a point does not depend on the other points of its chunk or on the number
+of processes, so scans are deterministic. With a `checkpoint` directory, every
+finished chunk is written to disk and skipped when the scan is run again, so an
+interrupted scan resumes where it stopped. The checkpoint records the scan it
+belongs to (points, initial condition, time span, chunk size, and a hash of
+`rhs` and the solver options), so it cannot be resumed with a different model
+or different solver settings. Files are written atomically, so a scan killed
+while writing never leaves a truncated chunk behind.
+"""
+import hashlib
+import inspect
+import itertools
+import multiprocessing
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from .cache import _update
+from .ensemble import integrate_ensemble
+
+
+def parameter_names(rhs):
+    """Names of the parameters of `rhs(t, y, *params)`, in order."""
+    return list(inspect.signature(rhs).parameters)[2:]
+
+
+def parameter_grid(rhs, p, **axes):
+    """All combinations of the parameter values in `axes`, the others taken from `p`.
+
+    `axes` maps parameter names of `rhs` to the values to scan, e.g.
+    `parameter_grid(ode, p, k_3=[1, 100], S=np.linspace(0, 4, 401))`. The last
+    axis varies fastest. Returns an array of shape (n_points, n_params).
+    """
+    names = parameter_names(rhs)
+    unknown = set(axes) - set(names)
+    if unknown:
+        raise ValueError(f"Unknown parameters for {rhs.__name__}: {sorted(unknown)}")
+
+    indices = [names.index(name) for name in axes]
+    points = np.tile(np.asarray(p, dtype=float), (int(np.prod([len(v) for v in axes.values()])), 1))
+    for row, values in zip(points, itertools.product(*axes.values())):
+        row[indices] = values
+    return points
+
+
+def _integrate_chunk(task):
+    rhs, points, y0, t_span, options = task
+    result = integrate_ensemble(rhs, t_span, np.broadcast_to(y0, (len(points), len(y0))), args=tuple(points.T),
+                                **options)
+    return result.y_final, result.success
+
+
+def scan(rhs, points, y0, t_span, chunk_size=1000, processes=None, checkpoint=None, **options):
+    """Integrate `rhs` for every row of `points` and yield the results chunk by chunk, in order.
+
+    `y0` is the initial condition used for every point. `processes=1` runs the
+    scan in this process, otherwise a pool of `processes` workers (default: one
+    per core) is used. Extra `options` are passed on to `integrate_ensemble`.
+
+    Yields `(chunk, y_final, success)` with the slice of `points` covered by the
+    chunk, the final states of shape (len(chunk), n) and the success mask.
+    """
+    points = np.asarray(points, dtype=float)
+    y0 = np.asarray(y0, dtype=float)
+    chunks = [slice(start, min(start + chunk_size, len(points))) for start in range(0, len(points), chunk_size)]
+
+    if checkpoint is not None:
+        checkpoint = Path(checkpoint)
+        checkpoint.mkdir(parents=True, exist_ok=True)
+        _check_scan(checkpoint, points, y0, t_span, chunk_size, _fingerprint(rhs, options))
+    done = {i for i, chunk in enumerate(chunks) if checkpoint is not None and _chunk_file(checkpoint, i).exists()}
+
+    tasks = ((rhs, points[chunk], y0, t_span, options) for i, chunk in enumerate(chunks) if i not in done)
+    if processes == 1:
+        results = map(_integrate_chunk, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap(_integrate_chunk, tasks)
+
+    try:
+        for i, chunk in enumerate(chunks):
+            if i in done:
+                with np.load(_chunk_file(checkpoint, i)) as data:
+                    y_final, success = data["y_final"], data["success"]
+            else:
+                y_final, success = next(results)
+                if checkpoint is not None:
+                    _save(_chunk_file(checkpoint, i), y_final=y_final, success=success)
+            yield chunk, y_final, success
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+def run_scan(rhs, points, y0, t_span, **options):
+    """Collect all chunks of `scan` into the final states (n_points, n) and the success mask."""
+    points = np.asarray(points, dtype=float)
+    y_final = np.empty((len(points), np.size(y0)))
+    success = np.empty(len(points), dtype=bool)
+    for chunk, y_chunk, success_chunk in scan(rhs, points, y0, t_span, **options):
+        y_final[chunk], success[chunk] = y_chunk, success_chunk
+    return y_final, success
+
+
+def _chunk_file(checkpoint, i):
+    return checkpoint / f"chunk_{i:06d}.npz"
+
+
+def _fingerprint(rhs, options):
+    """Hex digest of the qualified name and source of `rhs` and of the solver options."""
+    h = hashlib.sha256()
+    h.update(f"{getattr(rhs, '__module__', '')}.{getattr(rhs, '__qualname__', repr(rhs))}".encode())
+    _update(h, (rhs, options), set())
+    return h.hexdigest()
+
+
+def _save(file, **arrays):
+    """`np.savez` to a temporary file that is then moved onto `file`, so `file` is never truncated."""
+    with tempfile.NamedTemporaryFile(dir=file.parent, suffix=".tmp", delete=False) as f:
+        np.savez(f, **arrays)
+    os.replace(f.name, file)
+
+
+def _check_scan(checkpoint, points, y0, t_span, chunk_size, fingerprint):
+    """Store the scan definition, or make sure an existing checkpoint belongs to the same scan."""
+    definition = checkpoint / "scan.npz"
+    current = {"points": points, "y0": y0, "t_span": np.asarray(t_span, dtype=float), "chunk_size": chunk_size,
+               "fingerprint": np.array(fingerprint)}
+    if not definition.exists():
+        _save(definition, **current)
+        return
+    with np.load(definition) as stored:
+        if any(key not in stored or stored[key].shape != np.shape(value) or not np.array_equal(stored[key], value)
+               for key, value in current.items()):
+            raise ValueError(f"Checkpoint {checkpoint} belongs to a different scan")
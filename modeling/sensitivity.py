@@ -0,0 +1,219 @@
+"""Parameter sensitivities of trajectories, and fitting of parameters to data with exact gradients.
+
+The sensitivities S = dy/dtheta (shape (n, m)) of a trajectory with respect to
+m parameters theta obey the forward sensitivity equations
+
+    dS/dt = J(y) S + f_theta(y),    S(t_0) = 0,
+
+with the Jacobian J of the model and its derivative f_theta with respect to the
+parameters. `sensitivities` integrates them together with the model as one
+augmented system of n (1 + m) equations, so a single solve returns the
+trajectory and all its derivatives, instead of one more solve per parameter
+for finite differences. f_theta is computed by central differences of the
+right-hand side, in the same stacked call (2 m + 1 columns, which all models of
+the package support) that evaluates the model, so no derivatives with respect
+to the parameters have to be written by hand.
+
+For a scalar loss, `adjoint_gradient` gets the gradient from one forward solve
+and one backward solve of the adjoint equations dlambda/dt = -J^T lambda
+(with jumps at the data points) of size n + m, however many parameters there
+are. `fit` fits named parameters to time series by least squares, with the
+Jacobian of the residuals from the forward sensitivities
+(`scipy.optimize.least_squares`) or the gradient from the adjoint
+(`scipy.optimize.minimize`, for many parameters).
+"""
+import numpy as np
+from scipy.optimize import OptimizeResult, least_squares, minimize
+
+from .continuation import finite_difference_jac
+from .scan import parameter_names
+from .solver import solve
+
+
+def _stacked(fun, index, eps):
+    """`fun(t, y, *args)` and its derivative (n, m) with respect to `args[i]` for i in `index`, from one call."""
+    m, last = len(index), {}
+
+    def call(t, y, *args):
+        if last.get("args") != args:  # the perturbed columns only change with the parameters
+            values = np.array([args[i] for i in index], dtype=float)
+            steps = eps * np.maximum(1.0, np.abs(values))
+            rows = np.repeat(values[:, None], 2 * m + 1, axis=1)  # the last column is the unperturbed one
+            rows[np.arange(m), np.arange(m)] += steps
+            rows[np.arange(m), m + np.arange(m)] -= steps
+            columns = list(args)
+            for i, row in zip(index, rows):
+                columns[i] = row
+            last.update(args=args, columns=columns, steps=steps)
+        y = np.asarray(y, dtype=float)
+        f = np.asarray(fun(t, np.repeat(y[:, None], 2 * m + 1, axis=1), *last["columns"]), dtype=float)
+        return f[:, -1], (f[:, :m] - f[:, m:-1]) / (2 * last["steps"])
+
+    return call
+
+
+def parameter_jac(fun, index, eps=6e-6):
+    """Derivative (n, m) of `fun(t, y, *args)` with respect to `args[i]` for i in `index`, by central differences.
+
+    All parameters are perturbed in one call of `fun` with 2 m + 1 stacked columns.
+    """
+    call = _stacked(fun, list(index), eps)
+    return lambda t, y, *args: call(t, y, *args)[1]
+
+
+def _augmented(fun, jac, index, n, m):
+    """Right-hand side of the state with its sensitivities, and a block-diagonal approximation of its Jacobian."""
+    call = _stacked(fun, index, eps=6e-6)
+
+    def rhs(t, z, *args):
+        y, S = z[:n], z[n:].reshape(n, m)
+        f, f_theta = call(t, y, *args)
+        return np.concatenate([f, (np.asarray(jac(t, y, *args), dtype=float) @ S + f_theta).ravel()])
+
+    def rhs_jac(t, z, *args):
+        J = np.asarray(jac(t, z[:n], *args), dtype=float)
+        A = np.zeros((n * (1 + m), n * (1 + m)))
+        A[:n, :n] = J
+        A[n:, n:] = np.kron(J, np.eye(m))  # the second derivatives of f are left out
+        return A
+
+    return rhs, rhs_jac
+
+
+def sensitivities(fun, t_span, y0, args, index, jac=None, t_eval=None, rtol=1e-8, atol=1e-10, **options):
+    """Trajectory of `fun` from `y0` and its sensitivities to `args[i]` for i in `index`, in one solve.
+
+    Without an analytic `jac`, finite differences are used. Extra `options`
+    go to `modeling.solver.solve` (the method is chosen by stiffness by
+    default). Returns the result of `solve` with `y` of shape (n, len(t)) and
+    the `sensitivity` dy/dtheta of shape (n, m, len(t)).
+    """
+    jac = finite_difference_jac(fun) if jac is None else jac
+    y0 = np.asarray(y0, dtype=float)
+    n, m = len(y0), len(index)
+    rhs, rhs_jac = _augmented(fun, jac, list(index), n, m)
+    result = solve(rhs, t_span, np.concatenate([y0, np.zeros(n * m)]), args=tuple(args), jac=rhs_jac,
+                   t_eval=t_eval, rtol=rtol, atol=atol, **options)
+    result.sensitivity = result.y[n:].reshape(n, m, -1)
+    result.y = result.y[:n]
+    return result
+
+
+def _observed(observed, n):
+    return np.arange(n) if observed is None else np.atleast_1d(observed)
+
+
+def adjoint_gradient(fun, t_data, data, y0, args, index, observed=None, jac=None, t0=0.0, rtol=1e-8, atol=1e-10,
+                     method="auto"):
+    """Loss 1/2 sum (y_i(t_k) - data_ik)^2 and its gradient with respect to `args[i]` for i in `index`.
+
+    `data` has one row per component in `observed` (all by default) and one
+    column per time in `t_data` (sorted, after `t0`); NaN entries are ignored.
+    The gradient comes from the adjoint equations (see the module docstring).
+    Returns an `OptimizeResult` with `loss`, `gradient` and the right-hand
+    side calls of the forward and the backward solve, `nfev`.
+    """
+    jac = finite_difference_jac(fun) if jac is None else jac
+    jac_p = parameter_jac(fun, index)
+    args, y0 = tuple(args), np.asarray(y0, dtype=float)
+    t_data, data = np.asarray(t_data, dtype=float), np.atleast_2d(np.asarray(data, dtype=float))
+    n, m, observed = len(y0), len(index), _observed(observed, len(y0))
+
+    forward = solve(fun, (t0, t_data[-1]), y0, method=method, args=args, jac=jac, dense_output=True, rtol=rtol,
+                    atol=atol)
+    if not forward.success:
+        raise RuntimeError(f"Forward integration failed: {forward.message}")
+    error = np.zeros((n, len(t_data)))
+    error[observed] = np.nan_to_num(forward.sol(t_data)[observed] - data)
+
+    def backward_rhs(t, w):
+        y = forward.sol(t)
+        lam = w[:n]
+        return np.concatenate([-np.asarray(jac(t, y, *args), dtype=float).T @ lam, -lam @ jac_p(t, y, *args)])
+
+    # Backward from the last data point, adding dloss/dy at every data point on the way:
+    w, nfev = np.zeros(n + m), forward.nfev
+    times = np.concatenate([[t0], t_data])
+    for k in range(len(t_data), 0, -1):
+        w[:n] += error[:, k - 1]
+        if times[k] > times[k - 1]:
+            backward = solve(backward_rhs, (times[k], times[k - 1]), w, method=forward.method, rtol=rtol, atol=atol)
+            if not backward.success:
+                raise RuntimeError(f"Adjoint integration failed: {backward.message}")
+            w, nfev = backward.y[:, -1], nfev + backward.nfev
+
+    return OptimizeResult(loss=0.5 * np.sum(error**2), gradient=w[n:], nfev=nfev)
+
+
+def fit(fun, t_data, data, y0, p, names, observed=None, jac=None, t0=0.0, gradient="forward", bounds=(0, np.inf),
+        rtol=1e-8, atol=1e-10, **options):
+    """Fit the parameters `names` of `fun` (the others fixed at `p`) to `data` at `t_data` by least squares.
+
+    `data` has one row per component in `observed` (all by default); NaN
+    entries are ignored. With `gradient="forward"`, the residuals and their
+    Jacobian come from one `sensitivities` solve per iteration and
+    `scipy.optimize.least_squares` minimizes them; with `"adjoint"`, the loss
+    and its gradient come from `adjoint_gradient` and
+    `scipy.optimize.minimize` (L-BFGS-B) minimizes it, which pays off for
+    many parameters. The parameters stay within `bounds` (non-negative by
+    default). Extra `options` go to the optimizer.
+
+    Returns an `OptimizeResult` with the fitted values `x`, the full parameter
+    vector `p`, the final `loss`, the `residual` (model - data), their
+    `standard_error` estimated from the Jacobian at the optimum (forward only),
+    the number of model solves `nsolves`, `success` and `message`.
+    """
+    all_names = parameter_names(fun)
+    index = [all_names.index(name) for name in names]
+    t_data, data = np.asarray(t_data, dtype=float), np.atleast_2d(np.asarray(data, dtype=float))
+    observed = _observed(observed, len(y0))
+    valid = ~np.isnan(data)
+    solves = 0
+
+    def full(x):
+        q = list(p)
+        for i, value in zip(index, x):
+            q[i] = value
+        return q
+
+    x0 = np.array([p[i] for i in index], dtype=float)
+    lower, upper = (np.broadcast_to(np.asarray(b, dtype=float), x0.shape) for b in bounds)
+    if gradient == "forward":
+        last = {}
+
+        def evaluate(x):  # residuals and Jacobian from one solve, shared between the two callbacks
+            nonlocal solves
+            if last.get("x") is None or not np.array_equal(last["x"], x):
+                solves += 1
+                result = sensitivities(fun, (t0, t_data[-1]), y0, full(x), index, jac=jac,
+                                       t_eval=np.concatenate([[t0], t_data]) if t_data[0] > t0 else t_data,
+                                       rtol=rtol, atol=atol)
+                y, S = result.y[:, -len(t_data):], result.sensitivity[:, :, -len(t_data):]
+                last.update(x=np.array(x), r=(y[observed] - data)[valid], J=S[observed].transpose(0, 2, 1)[valid])
+            return last
+
+        opt = least_squares(lambda x: evaluate(x)["r"], x0, jac=lambda x: evaluate(x)["J"], bounds=(lower, upper),
+                            **options)
+        residual = opt.fun
+        dof = max(residual.size - len(x0), 1)
+        try:
+            covariance = np.linalg.inv(opt.jac.T @ opt.jac) * (residual @ residual) / dof
+            standard_error = np.sqrt(np.diag(covariance))
+        except np.linalg.LinAlgError:
+            standard_error = np.full(len(x0), np.inf)
+    elif gradient == "adjoint":
+        def loss(x):
+            nonlocal solves
+            solves += 1
+            result = adjoint_gradient(fun, t_data, data, y0, full(x), index, observed, jac, t0, rtol, atol)
+            return result.loss, result.gradient
+
+        opt = minimize(loss, x0, jac=True, method="L-BFGS-B", bounds=list(zip(lower, upper)), **options)
+        y = solve(fun, (t0, t_data[-1]), y0, args=tuple(full(opt.x)), jac=jac, t_eval=t_data, rtol=rtol,
+                  atol=atol).y
+        residual, standard_error = (y[observed] - data)[valid], None
+    else:
+        raise ValueError(f"Unknown gradient {gradient!r}, use 'forward' or 'adjoint'")
+
+    return OptimizeResult(x=opt.x, p=full(opt.x), loss=0.5 * residual @ residual, residual=residual,
+                          standard_error=standard_error, nsolves=solves, success=opt.success, message=opt.message)
@@ -0,0 +1,82 @@
+"""`solve_ivp` front end that picks the integration method from the stiffness of the problem.
+
+Explicit methods like the default `RK45` are only stable for steps with
+h * |lambda| below about 3.3 for the eigenvalues lambda of the Jacobian. A
+stiff problem, e.g. Michaelis-Menten kinetics with fast complex formation or
+the switch with k_3 and k_4 scaled up 100x, has eigenvalues much larger than
+its time scale of interest, so `RK45` needs at least |lambda| * T / 3.3 steps
+to cover the time span T however smooth the solution is. `stiffness` estimates
+this number from the spectral radius of the Jacobian, and `select_method` maps
+it to a method:
+
+- below `STIFF` steps: `RK45`,
+- below `VERY_STIFF` steps: `LSODA`, which switches between an explicit and
+  an implicit method on its own,
+- above: `Radau` for tight tolerances (rtol <= 1e-6), `BDF` otherwise.
+
+The spectrum is evaluated at the initial state and, since stiffness can develop
+on the way, again after a short explicit probe over `probe` of the time span.
+Without an analytic Jacobian, finite differences are used for the estimate.
+"""
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import ArpackNoConvergence, eigs
+
+from . import profiling
+from .continuation import finite_difference_jac
+
+STIFF = 500
+VERY_STIFF = 5000
+STABILITY_LIMIT = 3.3  # h * |lambda| at the boundary of the stability region of RK45 on the real axis
+
+
+def spectral_radius(J):
+    """Largest eigenvalue modulus of a dense or sparse Jacobian."""
+    if sparse.issparse(J) and J.shape[0] > 50:
+        try:
+            return float(np.abs(eigs(J, k=1, which="LM", return_eigenvectors=False)).max())
+        except ArpackNoConvergence:
+            J = J.toarray()
+    J = J.toarray() if sparse.issparse(J) else np.asarray(J, dtype=float)
+    return float(np.abs(np.linalg.eigvals(J)).max()) if J.size else 0.0
+
+
+def stiffness(fun, t_span, y, args=(), jac=None):
+    """Lower bound on the number of `RK45` steps over `t_span` that stability requires at `y`."""
+    jac = finite_difference_jac(fun) if jac is None else jac
+    return spectral_radius(jac(t_span[0], np.asarray(y, dtype=float), *args)) * abs(t_span[1] - t_span[0]) \
+        / STABILITY_LIMIT
+
+
+def select_method(fun, t_span, y0, args=(), jac=None, rtol=1e-3, probe=0.01):
+    """Integration method for the problem, see the module docstring. Returns the method and the stiffness."""
+    index = stiffness(fun, t_span, y0, args, jac)
+    if index < STIFF and probe:
+        t_probe = t_span[0] + probe * (t_span[1] - t_span[0])
+        probe_result = profiling.solve_ivp(fun, (t_span[0], t_probe), y0, kind="probe", args=args if args else None,
+                                           rtol=rtol)
+        if probe_result.success:
+            index = max(index, stiffness(fun, t_span, probe_result.y[:, -1], args, jac))
+
+    if index < STIFF:
+        return "RK45", index
+    if index < VERY_STIFF:
+        return "LSODA", index
+    return ("Radau" if rtol <= 1e-6 else "BDF"), index
+
+
+def solve(fun, t_span, y0, method="auto", args=(), jac=None, **options):
+    """`solve_ivp` with `method="auto"` choosing the method by `select_method`.
+
+    The result has the usual fields plus the `method` that was used and the
+    estimated `stiffness` (None if the method was given). The Jacobian is only
+    passed on to the implicit methods.
+    """
+    index = None
+    if method == "auto":
+        method, index = select_method(fun, t_span, y0, args, jac, options.get("rtol", 1e-3))
+    if jac is not None and method in ("Radau", "BDF", "LSODA"):
+        options["jac"] = jac
+    result = profiling.solve_ivp(fun, t_span, y0, method=method, args=args if args else None, **options)
+    result.method, result.stiffness = method, index
+    return result
@@ -0,0 +1,197 @@
+"""Steady states by root-finding instead of long time integration.
+
+`steady_state` solves f(y) = 0 with a damped Newton iteration that uses the
+analytic Jacobian of the model. It works on a single state of shape (n,) or on
+N stacked states of shape (N, n) (with the signal `p[-1]` either a scalar or an
+array of length N), iterating all of them at once. States for which Newton does
+not converge, or converges to an unstable steady state, are integrated with
+`modeling.sweep.sweep_batch` instead, only until they are within `steady_tol`
+of a steady state, and then polished by Newton again.
+
+`integrate_to_steady_state` is the convergence-aware version of a single
+`solve_ivp` call: it stops as soon as the state is within `tol` of its steady
+state, estimated by the length of the Newton step |J^-1 f| (see
+`modeling.sweep.steady_distance`), and records the time at which this
+happened. A sweep that steps the signal and waits for the response to settle
+thus does not integrate a flat line for most of its time span.
+"""
+import numpy as np
+from scipy.optimize import OptimizeResult
+
+from . import profiling
+from .solver import solve
+from .sweep import steady_distance, sweep_batch
+
+
+def _residual(rhs, y, args):
+    return np.asarray(rhs(0, y.T, *args), dtype=float).T
+
+
+def _jacobian(jac, y, args):
+    J = np.asarray(jac(0, y.T, *args), dtype=float)
+    return np.moveaxis(J.reshape(J.shape[:2] + (-1,)), -1, 0)  # (N, n, n)
+
+
+def newton(rhs, jac, y0, p, tol=1e-10, maxiter=50, max_halvings=10):
+    """Damped Newton iteration on stacked states of shape (N, n).
+
+    Every state takes full Newton steps as long as its residual norm decreases,
+    otherwise the step is halved up to `max_halvings` times. Returns the states,
+    their residual norms, a convergence mask and the number of iterations.
+    """
+    y = np.array(y0, dtype=float)
+    f = _residual(rhs, y, p)
+    norm = np.abs(f).max(axis=1)
+    active = norm > tol
+    nit = 0
+
+    while active.any() and nit < maxiter:
+        nit += 1
+        idx = np.flatnonzero(active)
+        args = _select(p, idx)
+        try:
+            step = np.linalg.solve(_jacobian(jac, y[idx], args), -f[idx][..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            break
+
+        scale = np.ones(len(idx))
+        for _ in range(max_halvings + 1):
+            trial = y[idx] + scale[:, None] * step
+            with np.errstate(invalid="ignore", divide="ignore"):
+                f_trial = _residual(rhs, trial, args)
+            norm_trial = np.abs(f_trial).max(axis=1)
+            accept = np.isfinite(norm_trial) & (norm_trial < norm[idx])
+            if accept.all():
+                break
+            scale = np.where(accept, scale, scale / 2)
+
+        y[idx[accept]] = trial[accept]
+        f[idx[accept]] = f_trial[accept]
+        norm[idx[accept]] = norm_trial[accept]
+        active[idx[~accept]] = False  # stalled, leave it to the fallback
+        active &= norm > tol
+
+    return y, norm, norm <= tol, nit
+
+
+def is_stable(jac, y, p):
+    """Whether the steady states `y` of shape (N, n) are linearly stable."""
+    return np.linalg.eigvals(_jacobian(jac, y, p)).real.max(axis=1) < 0
+
+
+def steady_state(rhs, jac, y0, p, tol=1e-10, maxiter=50, t_span=(0, 400), require_stable=True, steady_tol=1e-3,
+                 **options):
+    """Steady state of `rhs` near `y0`, falling back to integration if needed.
+
+    With `require_stable=True`, a Newton solution that is unstable counts as not
+    converged, so the fallback finds the stable state that the time integration
+    in the scripts would reach from `y0`. The fallback stops once all states are
+    within `steady_tol` of a steady state, which Newton then polishes (None
+    integrates over all of `t_span`). Extra `options` are passed on to
+    `sweep_batch`.
+
+    Returns an `OptimizeResult` with the steady state `y`, the residual norm
+    `residual` (max |dy/dt|), `success`, `stable`, `integrated` (whether the
+    fallback was used) and the number of Newton iterations `nit`. For stacked
+    input all of these are arrays with one entry per state.
+    """
+    single = np.ndim(y0) == 1 and np.ndim(p[-1]) == 0
+    y0 = np.atleast_2d(np.asarray(y0, dtype=float))
+    signal = np.atleast_1d(np.asarray(p[-1], dtype=float))
+    y0 = np.array(np.broadcast_to(y0, (max(len(signal), len(y0)), y0.shape[-1])))
+    signal = np.broadcast_to(signal, (len(y0),))
+    p = list(p[:-1]) + [signal]
+
+    with profiling.measure("steady_state", p) as record:
+        y, residual, success, nit = newton(rhs, jac, y0, p, tol, maxiter)
+        stable_mask = np.zeros(len(y), dtype=bool)
+        stable_mask[success] = is_stable(jac, y[success], _select(p, success))
+        integrated = ~success | (require_stable & ~stable_mask)
+
+        if integrated.any():
+            idx = np.flatnonzero(integrated)
+            y_int = sweep_batch(rhs, y0[idx], signal[idx], p, t_span, steady_tol=steady_tol,
+                                steady_jac=jac, **options)
+            p_idx = _select(p, integrated)
+            y[idx], residual[idx], success[idx], n = newton(rhs, jac, y_int, p_idx, tol, maxiter)
+            stable_mask[idx] = is_stable(jac, y[idx], p_idx)
+            nit += n
+        if record is not None:
+            record.update(nit=nit, n_integrated=int(integrated.sum()), status=int(success.all()))
+
+    result = OptimizeResult(y=y, residual=residual, success=success, stable=stable_mask,
+                            integrated=integrated, nit=nit)
+    if single:
+        for key in ("y", "residual", "success", "stable", "integrated"):
+            result[key] = result[key][0]
+    return result
+
+
+def steady_state_sweep(rhs, jac, y0, signal, p, **options):
+    """Follow the steady state along `signal`, using each solution as the next guess.
+
+    This is the root-finding counterpart of `modeling.sweep.sweep_continuation`
+    with `chunk_size=1`. Returns an `OptimizeResult` with arrays `y` of shape
+    (N, n), `residual`, `success`, `stable` and `integrated`.
+    """
+    signal = np.atleast_1d(np.asarray(signal, dtype=float))
+    y = np.asarray(y0, dtype=float)
+    results = []
+
+    for S in signal:
+        result = steady_state(rhs, jac, y, list(p[:-1]) + [S], **options)
+        results.append(result)
+        y = result.y
+
+    return OptimizeResult(
+        y=np.array([r.y for r in results]),
+        **{key: np.array([r[key] for r in results]) for key in ("residual", "success", "stable", "integrated")},
+    )
+
+
+def settled(rhs, jac, tol):
+    """Terminal `solve_ivp` event for the state getting within `tol` of its steady state."""
+    def event(t, y, *args):
+        return steady_distance(rhs, jac, t, y, args) - tol
+
+    event.terminal, event.direction = True, -1
+    return event
+
+
+def integrate_to_steady_state(rhs, t_span, y0, args=(), jac=None, tol=1e-6, t_eval=None, **options):
+    """Integrate `rhs` with `modeling.solver.solve` until the state is within `tol` of its steady state.
+
+    The distance is estimated with the Jacobian `jac` (see the module
+    docstring). It cannot drop below the error of the integration, so the
+    tolerances default to `rtol=1e-6, atol=1e-9` here: with the `rtol=1e-3` of
+    `solve_ivp`, the solution wobbles by about 1e-3 * |y| around the steady
+    state, and `RK45` needs hardly fewer steps for it on a long flat line.
+    Returns the result of `solve` with the time `t_steady` at which the state
+    settled (NaN if it did not within `t_span`), `settled` and the final state
+    `y_final`. Points of `t_eval` after `t_steady` get the settled state, so
+    the output looks like that of an integration over all of `t_span`.
+    """
+    y0 = np.asarray(y0, dtype=float)
+    t_eval = None if t_eval is None else np.asarray(t_eval, dtype=float)
+    options.setdefault("rtol", 1e-6)
+    options.setdefault("atol", 1e-9)
+    if steady_distance(rhs, jac, t_span[0], y0, args) < tol:  # nothing to integrate
+        t = np.array([t_span[0]]) if t_eval is None else t_eval
+        return OptimizeResult(t=t, y=np.repeat(y0[:, None], len(t), axis=1), t_steady=t_span[0], settled=True,
+                              y_final=y0, t_events=[np.empty(0)], y_events=[np.empty((0, len(y0)))], nfev=1,
+                              njev=0, nlu=0, status=1, success=True, method=None, stiffness=None,
+                              message="Already settled.")
+
+    result = solve(rhs, t_span, y0, args=args, jac=jac, t_eval=t_eval, events=settled(rhs, jac, tol), **options)
+    result.settled = result.status == 1
+    result.t_steady = result.t_events[0][0] if result.settled else np.nan
+    result.y_final = result.y_events[0][0] if result.settled else result.y[:, -1]
+    if result.settled and t_eval is not None:
+        rest = t_eval[len(result.t):]
+        result.t = np.concatenate([result.t, rest])
+        result.y = np.hstack([result.y, np.repeat(result.y_final[:, None], len(rest), axis=1)])
+    return result
+
+
+def _select(p, mask):
+    return [np.asarray(a)[mask] if np.ndim(a) else a for a in p]
@@ -0,0 +1,222 @@
+"""Stochastic simulation of reaction networks: Gillespie's direct method and adaptive tau-leaping.
+
+The engine runs the mass-action networks of `modeling.network` (e.g. the
+mechanisms of `modeling.mechanisms`) with copy numbers instead of
+concentrations. Reaction j fires with the propensity
+
+    a_j = volume * k_j * prod_i (x_i)_(R_ij) / volume^(R_ij)
+
+with the falling factorials (x)_r = x (x - 1) ... (x - r + 1), so the rate
+constants are those of the ODEs in concentrations x / volume, which the
+ensemble mean approaches for large `volume` (`volume=1` reads the rate
+constants per molecule).
+
+`method="ssa"` is the exact direct method; `method="tau"` leaps over many
+reactions at once with the step size selection of Cao, Gillespie and Petzold
+(2006, relative change of the propensities at most `epsilon`), and leaps at
+most 2 epsilon relaxation times of the mean long, which keeps the variance of
+stationary fluctuations within about epsilon. Reactions that
+could exhaust a reactant within a few firings (fewer than `N_CRITICAL`) are
+not leaped but fired one at a time, and where a leap would be shorter than a
+few exact steps, the realization takes an exact step instead, so populations
+never become negative and tau-leaping is exact at low copy numbers.
+
+All realizations of a chunk advance together, every step being a few array
+operations on the (n, N) stack of their states, and each realization keeps its
+own time. The chunks draw from independent streams spawned from one
+`numpy.random.SeedSequence(seed)`, so the result depends on the seed and the
+chunk size only, not on the number of processes. Only the moments at `t_eval`
+are kept (sums per chunk, merged across chunks), never the paths, apart from
+the first `n_paths` realizations for plotting.
+"""
+import multiprocessing
+
+import numpy as np
+from scipy.optimize import OptimizeResult
+
+N_CRITICAL = 10  # reactions that can fire fewer times before a reactant runs out are not leaped
+N_EXACT = 10  # leaps shorter than this many mean exact steps are replaced by an exact step
+
+
+class _Kinetics:
+    """Stoichiometry and propensities of a network for copy numbers."""
+
+    def __init__(self, network, rates, volume):
+        self.nu = network.stoichiometry.toarray()  # (n, m)
+        self.species, self.order = network._species, network._order  # reactants padded with index n and order 0
+        orders = network.orders  # (m, n)
+        k = np.array([float(rate) for rate in rates])[network.rate_index]
+        self.scale = k * volume ** (1.0 - orders.sum(axis=1))
+        self.max_order = max(1, int(orders.max(initial=0)))
+
+        # Highest order of the reactions each species takes part in as a reactant, and its own order there
+        # (the g_i of Cao et al.), 0 for species that are never consumed or catalytic:
+        total = orders.sum(axis=1)
+        self.hor = np.array([total[orders[:, i] > 0].max(initial=0) for i in range(len(self.nu))])
+        self.own = np.array([orders[(orders[:, i] > 0) & (total == self.hor[i]), i].max(initial=0)
+                             for i in range(len(self.nu))])
+        self.consumed = self.nu < 0
+        self.orders = orders
+
+    def propensities(self, x):
+        """Propensities (m, N) of the states x (n, N)."""
+        padded = np.vstack([x, np.ones((1, x.shape[1]))])[self.species]  # (m, width, N)
+        terms = np.ones_like(padded)
+        for q in range(self.max_order):
+            terms *= np.where(q < self.order[:, :, None], np.maximum(padded - q, 0.0), 1.0)
+        return self.scale[:, None] * terms.prod(axis=1)
+
+    def g(self, x):
+        """g_i of Cao et al. (2006), so that eps x_i / g_i bounds the relative change of the propensities."""
+        x1, x2 = np.maximum(x - 1, 1), np.maximum(x - 2, 1)
+        hor, own = self.hor[:, None], self.own[:, None]
+        g = np.where(own == 2, np.where(hor == 2, 2 + 1 / x1, 1.5 * (2 + 1 / x1)), hor.astype(float))
+        return np.where(own == 3, 3 + 1 / x1 + 2 / x2, g)
+
+
+def _choose(a, u):
+    """Index of the reaction with cumulative propensity above u * a0, per column."""
+    cumulative = np.cumsum(a, axis=0)
+    return np.minimum((cumulative < u * cumulative[-1]).sum(axis=0), len(a) - 1)
+
+
+def _leap(kinetics, x, a, a0, t, t_cap, epsilon, shrink, rng):
+    """Proposed time and state change of tau-leaping; exact steps where leaping does not pay off."""
+    nu = kinetics.nu
+    with np.errstate(divide="ignore", invalid="ignore"):
+        firings = np.where(kinetics.consumed[:, :, None], x[:, None, :] // np.abs(nu)[:, :, None], np.inf).min(axis=0)
+        critical = (firings < N_CRITICAL) & (a > 0)
+        a_leap = np.where(critical, 0.0, a)
+        mu, sigma2 = nu @ a_leap, (nu**2) @ a_leap
+        bound = np.maximum(epsilon * x / kinetics.g(x), 1.0)
+        reactant = (kinetics.hor > 0)[:, None]
+        tau = np.where(reactant, np.minimum(bound / np.abs(mu), bound**2 / sigma2), np.inf).min(axis=0)
+        # Leaps also stay short against the relaxation of the mean (the diagonal of its Jacobian), which
+        # otherwise inflates stationary fluctuations by a relative lambda tau / 2:
+        relaxation = np.abs((nu * kinetics.orders.T) @ a_leap) / np.maximum(x, 1.0)
+        tau = np.minimum(tau, (2 * epsilon / relaxation).min(axis=0)) * shrink
+        exact = tau < N_EXACT / a0
+        a_critical = np.where(critical, a, 0.0).sum(axis=0)
+        tau_critical = rng.exponential(1.0, len(a0)) / a_critical
+        tau_exact = rng.exponential(1.0, len(a0)) / a0
+
+        fire_critical = ~exact & (tau_critical <= np.minimum(tau, t_cap - t))
+        step = np.where(exact, tau_exact, np.minimum(np.minimum(tau, tau_critical), t_cap - t))
+
+        counts = rng.poisson(np.where(exact | ~np.isfinite(step), 0.0, a_leap * step))
+        single = _choose(np.where(exact, a, np.where(critical, a, 0.0)), rng.random(len(a0)))
+        counts[single, np.arange(len(a0))] += exact | fire_critical
+    return t + step, nu @ counts
+
+
+def _simulate_chunk(task):
+    """Moments at `t_eval` (sums of x - x0 and their squares) of one chunk of realizations."""
+    network, x0, rates, t_eval, n, method, volume, epsilon, n_paths, seed = task
+    kinetics = _Kinetics(network, rates, volume)
+    rng = np.random.default_rng(seed)
+    x0 = np.asarray(x0, dtype=float)
+    T = len(t_eval)
+    sums, squares = np.zeros((len(x0), T)), np.zeros((len(x0), T))
+    paths = np.zeros((len(x0), T, n_paths))
+    n_steps = 0
+
+    x = np.repeat(x0[:, None], n, axis=1)
+    t = np.full(n, float(t_eval[0]))
+    pending = np.zeros(n, dtype=int)  # index of the first output not recorded yet
+    shrink = np.ones(n)
+    run = np.arange(n)
+    while len(run):
+        a = kinetics.propensities(x)
+        a0 = a.sum(axis=0)
+        with np.errstate(divide="ignore"):
+            if method == "ssa":
+                t_new = t + rng.exponential(1.0, len(run)) / a0
+                change = np.where(a0 > 0, kinetics.nu[:, _choose(a, rng.random(len(run)))], 0.0)
+            else:
+                t_cap = np.append(t_eval, np.inf)[np.searchsorted(t_eval, t, side="right")]
+                t_new, change = _leap(kinetics, x, a, a0, t, t_cap, epsilon, shrink, rng)
+        rejected = np.any(x + change < 0, axis=0)  # only possible for leaps
+        shrink = np.where(rejected, 0.5 * shrink, 1.0)
+        t_new = np.where(rejected, t, t_new)
+
+        # The state holds until t_new, so it is the state at the outputs before t_new:
+        until = np.searchsorted(t_eval, t_new, side="left")
+        while True:
+            due = np.flatnonzero(pending < until)
+            if not len(due):
+                break
+            k, y = pending[due], x[:, due] - x0[:, None]
+            np.add.at(sums, (slice(None), k), y)
+            np.add.at(squares, (slice(None), k), y**2)
+            path = run[due] < n_paths
+            paths[:, k[path], run[due][path]] = x[:, due[path]]
+            pending[due] += 1
+
+        x = x + np.where(rejected, 0.0, change)
+        t = t_new
+        n_steps += len(run)
+
+        active = pending < T
+        if not active.all():
+            x, t, pending, shrink, run = x[:, active], t[active], pending[active], shrink[active], run[active]
+
+    return n, sums, squares, paths, n_steps
+
+
+def simulate_chunks(network, x0, rates, t_eval, n_runs=10000, method="ssa", seed=0, volume=1.0, epsilon=0.03,
+                    chunk_size=10000, processes=None, n_paths=0):
+    """Simulate `n_runs` realizations of `network` from the copy numbers `x0` and yield their moments chunk by chunk.
+
+    `rates` are the rate constants in the order of `network.parameters` and
+    `t_eval` the sorted output times (the first is the initial time).
+    `processes=1` runs in this process, otherwise a pool of `processes` workers
+    (default: one per core) simulates the chunks. Yields, in order, an
+    `OptimizeResult` per chunk with the number of realizations `n`, the `mean`
+    and the sum of squared deviations `m2` of every species at every output
+    time (shape (n_species, len(t_eval))), the first `paths` of the chunk (shape
+    (n_species, len(t_eval), n_paths), only in the first chunk) and the number
+    of steps `n_steps` (exact steps and leaps of all realizations).
+    """
+    if method not in ("ssa", "tau"):
+        raise ValueError(f"Unknown method {method!r}, use 'ssa' or 'tau'")
+    t_eval = np.asarray(t_eval, dtype=float)
+    x0 = np.asarray(x0, dtype=float)
+    sizes = [min(chunk_size, n_runs - start) for start in range(0, n_runs, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = ((network, x0, tuple(rates), t_eval, size, method, volume, epsilon, n_paths if i == 0 else 0, child)
+             for i, (size, child) in enumerate(zip(sizes, seeds)))
+
+    if processes == 1 or len(sizes) <= 1:
+        results, pool = map(_simulate_chunk, tasks), None
+    else:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap(_simulate_chunk, tasks)
+    try:
+        for n, sums, squares, paths, n_steps in results:
+            yield OptimizeResult(n=n, mean=x0[:, None] + sums / n, m2=squares - sums**2 / n, paths=paths,
+                                 n_steps=n_steps)
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+def simulate(network, x0, rates, t_eval, n_runs=10000, **options):
+    """Mean and variance of the copy numbers over `n_runs` realizations, merged from `simulate_chunks`.
+
+    Returns an `OptimizeResult` with `t`, the `mean`, the sample variance `var`
+    and the standard error of the mean `sem` (each of shape
+    (n_species, len(t_eval))), the first `paths` (see `simulate_chunks`), the
+    number of realizations `n_runs` and of steps `n_steps`.
+    """
+    n, mean, m2, paths, n_steps = 0, 0.0, 0.0, None, 0
+    for chunk in simulate_chunks(network, x0, rates, t_eval, n_runs, **options):
+        # Pairwise update of the mean and the sum of squared deviations (Chan et al.):
+        total = n + chunk.n
+        delta = chunk.mean - mean
+        mean = mean + delta * chunk.n / total
+        m2 = m2 + chunk.m2 + delta**2 * n * chunk.n / total
+        n, n_steps = total, n_steps + chunk.n_steps
+        paths = chunk.paths if paths is None else paths
+    var = m2 / max(n - 1, 1)
+    return OptimizeResult(t=np.asarray(t_eval, dtype=float), mean=mean, var=var, sem=np.sqrt(var / n), paths=paths,
+                          n_runs=n, n_steps=n_steps)
@@ -0,0 +1,84 @@
+"""Growable column buffers for trajectories that are collected piece by piece.
+
+Collecting the results of a sweep with `np.append` copies the whole history on
+every call, which is quadratic in the number of samples. `TrajectoryStore`
+keeps one preallocated array per column (e.g. time, signal and every state
+variable) and doubles its capacity when it runs full, so appending n samples
+costs O(n) in total. The columns are exported as views of the buffers, without
+copying.
+
+Every `append` can be tagged with the parameter values it belongs to, e.g.
+`store.append(params={"S": 0.1}, t=..., R=...)`; `index` lists these segments
+as `{"params": ..., "start": ..., "stop": ...}` so the samples of a parameter
+point can be found again. `modeling.archive` writes the same layout to disk.
+"""
+import numpy as np
+
+
+class TrajectoryStore:
+    """Column-oriented buffers for the named quantities `names`.
+
+    `capacity` is the number of samples allocated up front; if the total is
+    known (e.g. number of sweep steps times `len(t_eval)`), nothing is ever
+    reallocated.
+    """
+
+    def __init__(self, names, capacity=1024, dtype=float):
+        self.names = list(names)
+        self.size = 0
+        self.index = []
+        self._buffers = {name: np.empty(max(capacity, 1), dtype=dtype) for name in self.names}
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def capacity(self):
+        return len(self._buffers[self.names[0]])
+
+    def append(self, params=None, **columns):
+        """Append samples, one keyword per name; scalars are repeated to the length of the others.
+
+        With `params` (a dictionary of parameter values), the samples are
+        recorded as a segment in `index`.
+        """
+        unknown = set(columns) - set(self.names)
+        missing = set(self.names) - set(columns)
+        if unknown or missing:
+            raise ValueError(f"Expected columns {self.names}, got {sorted(columns)}")
+
+        n = max(np.size(values) for values in columns.values())
+        self.reserve(self.size + n)
+        for name, values in columns.items():
+            self._buffers[name][self.size:self.size + n] = values
+        if params is not None:
+            self.index.append({"params": dict(params), "start": self.size, "stop": self.size + n})
+        self.size += n
+
+    def clear(self):
+        """Drop all samples and segments, keeping the buffers."""
+        self.size = 0
+        self.index = []
+
+    def reserve(self, capacity):
+        """Make room for at least `capacity` samples, growing geometrically."""
+        if capacity <= self.capacity:
+            return
+        new_capacity = max(capacity, 2 * self.capacity)
+        for name, buffer in self._buffers.items():
+            grown = np.empty(new_capacity, dtype=buffer.dtype)
+            grown[:self.size] = buffer[:self.size]
+            self._buffers[name] = grown
+
+    def __getitem__(self, name):
+        """View of the filled part of column `name` (valid until the next reallocation)."""
+        return self._buffers[name][:self.size]
+
+    def columns(self):
+        """Dictionary of views of all columns."""
+        return {name: self[name] for name in self.names}
+
+    def segments(self, **params):
+        """Slices of the segments whose parameters include `params`, e.g. `segments(S=0.1)`."""
+        return [slice(segment["start"], segment["stop"]) for segment in self.index
+                if all(segment["params"].get(key) == value for key, value in params.items())]
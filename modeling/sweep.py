@@ -0,0 +1,111 @@
+"""Batched steady-state sweeps over the signal strength `S`.
+
+Instead of one `solve_ivp` call per signal value, all signal values of a sweep
+are integrated together as one stacked system. The state of N copies of an
+n-dimensional model is stored as an (n, N) array and flattened for the solver,
+so a column-wise right-hand side (see `modeling.switch`) evaluates every copy
+in a single call.
+
+The signal is always the last entry of the parameter vector `p`, as in the
+scripts of the signaling project.
+"""
+import numpy as np
+from scipy.sparse import eye, kron
+
+from . import profiling
+
+IMPLICIT_METHODS = ("Radau", "BDF", "LSODA")
+
+
+def stacked_rhs(rhs, n_state, p, signal):
+    """Right-hand side of N stacked copies of `rhs`, one per signal value."""
+    signal = np.asarray(signal, dtype=float)
+    args = tuple(p[:-1]) + (signal,)
+
+    def fun(t, y):
+        return np.asarray(rhs(t, y.reshape(n_state, -1), *args)).reshape(-1)
+
+    return fun
+
+
+def steady_distance(rhs, jac, t, y, args):
+    """Estimated distance of the states `y` ((n,) or (n, N)) from their steady states.
+
+    This is the length max |J^-1 f| of the Newton step, which stays large on
+    the slow approach to a fold, where |f| alone is already small. Without
+    `jac` it falls back to max |f|.
+    """
+    f = np.asarray(rhs(t, y, *args), dtype=float)
+    if jac is None:
+        return np.abs(f).max(axis=0)
+    n = len(f)
+    J = np.moveaxis(np.asarray(jac(t, y, *args), dtype=float).reshape(n, n, -1), -1, 0)  # (N, n, n)
+    try:
+        step = np.linalg.solve(J, f.reshape(n, -1).T[..., None])[..., 0]
+    except np.linalg.LinAlgError:  # singular at a fold
+        return np.full(f.shape[1:], np.inf)
+    return np.abs(step).max(axis=1).reshape(f.shape[1:])
+
+
+def stacked_sparsity(n_state, n_copies):
+    """Jacobian sparsity of the stacked system (copies are uncoupled)."""
+    return kron(np.ones((n_state, n_state)), eye(n_copies), format="csr")
+
+
+def sweep_batch(rhs, y0, signal, p, t_span=(0, 400), method="RK45", steady_tol=None, steady_jac=None,
+                **options):
+    """Integrate `rhs` for every value in `signal` at once and return the end states.
+
+    Every signal value starts from `y0`, which is either a single state of shape
+    (n,) or one state per signal value of shape (N, n). Returns an array of
+    shape (N, n) with the states at `t_span[1]`, or with `steady_tol` as soon as
+    all states are closer than `steady_tol` to their steady states (estimated
+    with `steady_distance` and the Jacobian `steady_jac` of `rhs`).
+    """
+    signal = np.atleast_1d(np.asarray(signal, dtype=float))
+    y0 = np.asarray(y0, dtype=float)
+    n_state = y0.shape[-1]
+    y0 = np.broadcast_to(y0, (len(signal), n_state))
+
+    if method in IMPLICIT_METHODS and "jac" not in options:
+        options.setdefault("jac_sparsity", stacked_sparsity(n_state, len(signal)))
+
+    fun = stacked_rhs(rhs, n_state, p, signal)
+    if steady_tol is not None:
+        args = tuple(p[:-1]) + (signal,)
+
+        def steady(t, y):
+            return steady_distance(rhs, steady_jac, t, y.reshape(n_state, -1), args).max() - steady_tol
+
+        steady.terminal, steady.direction = True, -1
+        options["events"] = steady
+    results = profiling.solve_ivp(fun, t_span, y0.T.reshape(-1), method=method, kind="sweep_batch",
+                                  params=tuple(p[:-1]) + (signal,), t_eval=[t_span[1]], **options)
+    if not results.success:
+        raise RuntimeError(f"Batched sweep failed: {results.message}")
+
+    y_end = results.y_events[0][0] if results.status == 1 else results.y[:, -1]
+    return y_end.reshape(n_state, -1).T
+
+
+def sweep_continuation(rhs, y0, signal, p, chunk_size=10, t_span=(0, 400), method="RK45", **options):
+    """Sweep `signal` in order, carrying the previous end state forward (hysteresis).
+
+    The sweep is split into chunks of `chunk_size` consecutive signal values. All
+    values of a chunk are integrated together, starting from the end state of the
+    last value of the previous chunk. With `chunk_size=1` this is exactly the
+    serial sweep; larger chunks trade a longer transient for fewer solver calls.
+    Close to a fold the transient is slow, so end states there can differ from
+    the serial sweep until `t_span` is long enough for both to settle.
+    Returns an array of shape (N, n) with the end state for each signal value.
+    """
+    signal = np.atleast_1d(np.asarray(signal, dtype=float))
+    y = np.asarray(y0, dtype=float)
+    states = np.empty((len(signal), y.shape[-1]))
+
+    for start in range(0, len(signal), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        states[chunk] = sweep_batch(rhs, y, signal[chunk], p, t_span, method, **options)
+        y = states[chunk][-1]
+
+    return states
@@ -0,0 +1,48 @@
+"""Irreversible switch: full model for (R, E*) and its Goldbeter-Koshland reduction.
+
+Both right-hand sides follow the `solve_ivp` convention, but they are written
+column-wise: `y` may be a single state of shape (n,) or a stack of states of
+shape (n, N), in which case `S` may be a scalar or an array of length N.
+"""
+import numpy as np
+
+from .kinetics import goldbeter_koshland, goldbeter_koshland_du1
+
+
+def ode(t, y, k_0, k_1, k_2, k_3, k_4, K_M3, K_M4, E_T, S):
+    dydt = np.array([
+        k_0 * y[1] + k_1 * S - k_2 * y[0],
+        k_3 * y[0] * (E_T - y[1]) / (K_M3 + E_T - y[1]) - k_4 * (y[1]) / (K_M4 + y[1])
+    ])
+    return dydt
+
+
+def ode_gk(t, y, k_0, k_1, k_2, k_3, k_4, K_M3, K_M4, E_T, S):
+    E_p = goldbeter_koshland(k_3 * y[0], k_4, K_M3 / E_T, K_M4 / E_T) * E_T
+    dydt = np.array([
+        k_0 * E_p + k_1 * S - k_2 * y[0]
+    ])
+    return dydt
+
+
+def jac(t, y, k_0, k_1, k_2, k_3, k_4, K_M3, K_M4, E_T, S):
+    """Analytic Jacobian of `ode`, shape (2, 2) or (2, 2, N) for stacked states."""
+    R, E = y[0], y[1]
+    zero = np.zeros_like(R * E, dtype=float)
+    return np.array([
+        [zero - k_2, zero + k_0],
+        [k_3 * (E_T - E) / (K_M3 + E_T - E) + zero,
+         -k_3 * R * K_M3 / (K_M3 + E_T - E)**2 - k_4 * K_M4 / (K_M4 + E)**2]
+    ])
+
+
+def jac_gk(t, y, k_0, k_1, k_2, k_3, k_4, K_M3, K_M4, E_T, S):
+    """Analytic Jacobian of `ode_gk`, shape (1, 1) or (1, 1, N) for stacked states."""
+    dE_p = goldbeter_koshland_du1(k_3 * y[0], k_4, K_M3 / E_T, K_M4 / E_T) * E_T * k_3
+    return np.array([
+        [k_0 * dE_p - k_2]
+    ])
+
+
+# PARAMETER VALUES USED THROUGHOUT THE SIGNALING PROJECT
+PARAMS = [0.4, 0.01, 1, 1, 0.2, 0.4, 0.4, 1, 0]  # k_0, k_1, k_2, k_3, k_4, K_M3, K_M4, E_T, S
@@ -1,32 +1,23 @@
+import sys
+from pathlib import Path
+
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
-from scipy.integrate import solve_ivp
-
-
-def ode(t, y, k_0, k_1, k_2, k_3, k_4, K_M3, K_M4, E_T, S):
-    dydt = np.array([
-        k_0 * y[1] + k_1 * S - k_2 * y[0],
-        k_3 * y[0] * (E_T - y[1]) / (K_M3 + E_T - y[1]) - k_4 * (y[1]) / (K_M4 + y[1])
-    ])
-    return dydt
-
-
-def goldbeter_koshland(u_1, u_2, J_1, J_2):
-    B = u_2 - u_1 + J_1 * u_2 + J_2 * u_1
-    return (2 * u_1 * J_2) / (B + np.sqrt(B**2 - 4 * (u_2 - u_1) * u_1 * J_2))
-
-
-def ode_gk(t, y, k_0, k_1, k_2, k_3, k_4, K_M3, K_M4, E_T, S):
-    dydt = np.zeros([1, 1])
-    E_p = goldbeter_koshland(k_3*y[0], k_4, K_M3/E_T, K_M4/E_T) * E_T
-    dydt[0] = k_0 * E_p + k_1 * S - k_2 * y[0]
-    return dydt
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # make the shared `modeling` package importable
+from modeling.animation import Trace
+from modeling.archive import Archive, ArchiveWriter
+from modeling.cache import cached_call
+from modeling.steady_state import integrate_to_steady_state
+from modeling.store import TrajectoryStore
+from modeling.switch import ode, ode_gk, jac, jac_gk
 
 # GENERAL PARAMETERS
 t_span = [0, 400]  # time span
 t_eval = np.linspace(*t_span, 2000)  # time points for plotting
+steady_tol = 1e-6  # stop integrating within this distance of the steady state, the rest of t_span is flat
+archive_path = None  # e.g. "signaling_response/output/full_response_sweep" to keep the sweep on disk and replot from it
 
 # PARAMETERS VALUES
 k_0 = 0.4
@@ -48,50 +39,43 @@ t_total = 0  # to keep track of time
 min_S = 0
 max_S = 4
 
-# ARRAYS TO STORE RESULTS
-S_full = np.zeros([1, 1])
-R_full = np.zeros([1, 1])
-R_full_gk = np.zeros([1, 1])
-E_full = np.zeros([1, 1])
-t_full = np.zeros([1, 1])
-
-# ASCENDING SIGNAL
-S_asc = np.linspace(min_S, max_S, int((max_S - min_S) / 0.1) + 1)  # signal range
-
-for i in range(len(S_asc)):
-    p[-1] = S_asc[i]  # set current signal strength
-    # Solve ODE numerically and update arrays:
-    results = solve_ivp(ode, t_span, y0, t_eval=t_eval, args=p)
-    R_full = np.append(R_full, results.y[0])
-    E_full = np.append(E_full, results.y[1])
-    t_full = np.append(t_full, results.t + t_total)
-    S_full = np.append(S_full, np.full_like(results.t, S_asc[i]))
-    t_total += results.t[-1]
-    # Compute Goldbeter-Koshland approximation for previous numerical solution:
-    gk = solve_ivp(ode_gk, t_span, y0_gk, t_eval=t_eval, args=p)
-    R_full_gk = np.append(R_full_gk, gk.y[0])
-    # Update initial conditions:
-    y0 = results.y[:, -1]
-    y0_gk = gk.y[:, -1]
-
-# DESCENDING SIGNAL
-S_desc = np.linspace(max_S, min_S, int((max_S - min_S) / 0.5) + 1)  # signal range
-
-for i in range(len(S_desc)):
-    p[-1] = S_desc[i]  # set current signal strength
-    # Solve ODE numerically and update arrays:
-    results = solve_ivp(ode, t_span, y0, t_eval=t_eval, args=p)
-    R_full = np.append(R_full, results.y[0])
-    E_full = np.append(E_full, results.y[1])
-    t_full = np.append(t_full, results.t + t_total)
-    S_full = np.append(S_full, np.full_like(results.t, S_desc[i]))
-    t_total += results.t[-1]
-    # Compute Goldbeter-Koshland approximation for previous numerical solution:
-    gk = solve_ivp(ode_gk, t_span, y0_gk, t_eval=t_eval, args=p)
-    R_full_gk = np.append(R_full_gk, gk.y[0])
-    # Update initial conditions:
-    y0 = results.y[:, -1]
-    y0_gk = gk.y[:, -1]
+# SIGNAL RANGES
+S_asc = np.linspace(min_S, max_S, int((max_S - min_S) / 0.1) + 1)  # ascending signal
+S_desc = np.linspace(max_S, min_S, int((max_S - min_S) / 0.5) + 1)  # descending signal
+
+# SWEEP (ASCENDING, THEN DESCENDING SIGNAL)
+if archive_path is not None and (Path(archive_path) / "archive.json").exists() and Archive(archive_path).complete:
+    store = Archive(archive_path)  # replot a stored sweep without simulating it again
+else:
+    names = ["t", "S", "R", "E", "R_gk"]
+    if archive_path is None:
+        store = TrajectoryStore(names, capacity=(len(S_asc) + len(S_desc)) * len(t_eval))
+    else:
+        store = ArchiveWriter(archive_path, names)  # written to disk chunk by chunk as the sweep runs
+
+    for direction, S in [("ascending", S) for S in S_asc] + [("descending", S) for S in S_desc]:
+        p[-1] = S  # set current signal strength
+        # Solve ODE numerically until it settles (method chosen by stiffness, results cached on disk):
+        results = cached_call(integrate_to_steady_state, ode, t_span, y0, t_eval=t_eval, args=p, jac=jac, tol=steady_tol)
+        # Compute Goldbeter-Koshland approximation for previous numerical solution:
+        gk = cached_call(integrate_to_steady_state, ode_gk, t_span, y0_gk, t_eval=t_eval, args=p, jac=jac_gk,
+                         tol=steady_tol)
+        # Store both solutions with the time it took them to settle:
+        store.append(params={"direction": direction, "S": S, "t_steady": results.t_steady, "t_steady_gk": gk.t_steady},
+                     t=results.t + t_total, S=S, R=results.y[0], E=results.y[1], R_gk=gk.y[0])
+        t_total += results.t[-1]
+        # Update initial conditions:
+        y0 = results.y_final
+        y0_gk = gk.y_final
+
+    if archive_path is not None:
+        store = store.close()
+
+# TRACES FOR THE ANIMATION
+t_full, S_full, R_full, R_full_gk = store["t"], store["S"], store["R"], store["R_gk"]  # views or memory maps, no copies
+trace_R = Trace(t_full, R_full)  # decimated lines and running limits, computed once
+trace_R_gk = Trace(t_full, R_full_gk)
+trace_S = Trace(t_full, S_full)
 
 # FIGURE INITIALIZATION
 fig = plt.figure(figsize=(12, 6), dpi=100)
@@ -124,13 +108,16 @@ def update(frame):
     if frame == 0:
         return  # skip the first frame to avoid empty arrays
 
-    line_R.set_data(t_full[:frame], R_full[:frame])
-    line_R_gk.set_data(t_full[:frame], R_full_gk[:frame])
-    line_S.set_data(t_full[:frame], S_full[:frame])
+    line_R.set_data(*trace_R.data(frame))
+    line_R_gk.set_data(*trace_R_gk.data(frame))
+    line_S.set_data(*trace_S.data(frame))
 
+    # Axis limits follow the data, so every frame is redrawn in full (no blitting):
+    R_min, R_max = trace_R.limits(frame)
+    S_min, S_max = trace_S.limits(frame)
     ax.set_xlim(t_full[0], t_full[frame])
-    ax.set_ylim(R_full[:frame].min(), R_full[:frame].max() * 1.05)
-    ax2.set_ylim(S_full[:frame].min(), S_full[:frame].max() * 1.05)
+    ax.set_ylim(R_min, R_max * 1.05)
+    ax2.set_ylim(S_min, S_max * 1.05)
 
     return line_R, line_R_gk, line_S
 
@@ -143,5 +130,6 @@ plt.tight_layout()
 # Create and save the animation as a GIF:
 ani = FuncAnimation(fig, update, frames=frame_indices[100:], interval=10, repeat=False)
 
-# ani.save("signaling_response/output/full_response.gif", fps=30)
+# from modeling.animation import export
+# export(fig, update, frame_indices[100:], "signaling_response/output/full_response.gif", fps=30)  # in parallel
 # plt.show()
@@ -1,32 +1,20 @@
+import sys
+from pathlib import Path
+
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
-from scipy.integrate import solve_ivp
-
-
-def ode(t, y, k_0, k_1, k_2, k_3, k_4, K_M3, K_M4, E_T, S):
-    dydt = np.array([
-        k_0 * y[1] + k_1 * S - k_2 * y[0],
-        k_3 * y[0] * (E_T - y[1]) / (K_M3 + E_T - y[1]) - k_4 * (y[1]) / (K_M4 + y[1])
-    ])
-    return dydt
-
 
-def goldbeter_koshland(u_1, u_2, J_1, J_2):
-    B = u_2 - u_1 + J_1 * u_2 + J_2 * u_1
-    return (2 * u_1 * J_2) / (B + np.sqrt(B**2 - 4 * (u_2 - u_1) * u_1 * J_2))
-
-
-def ode_gk(t, y, k_0, k_1, k_2, k_3, k_4, K_M3, K_M4, E_T, S):
-    dydt = np.zeros([1, 1])
-    E_p = goldbeter_koshland(k_3*y[0], k_4, K_M3/E_T, K_M4/E_T) * E_T
-    dydt[0] = k_0 * E_p + k_1 * S - k_2 * y[0]
-    return dydt
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # make the shared `modeling` package importable
+from modeling.archive import ArchiveWriter
+from modeling.switch import ode, ode_gk, jac, jac_gk
+from modeling.continuation import continuation
+from modeling.steady_state import steady_state_sweep
 
 
 # GENERAL PARAMETERS
-t_span = [0, 400]  # time span
-t_eval = np.linspace(*t_span, 2000)  # time points for plotting
+t_span = [0, 400]  # time span, only used where root-finding does not converge
+archive_path = None  # e.g. "signaling_response/output/steady_state_sweep" to keep the steady states on disk
 
 # PARAMETERS VALUES
 k_0 = 0.4
@@ -38,51 +26,48 @@ K_M3 = 0.4
 K_M4 = 0.4
 E_T = 1  # total enzyme concentration
 
-p = [k_0, k_1, k_2, k_3, k_4, K_M3, K_M4, E_T, 0]  # parameter vector, leave S = 0 for now
+p = [k_0, k_1, k_2, k_3, k_4, K_M3, K_M4, E_T, 0]  # parameter vector, S is set by the sweep
 
 # INITIAL CONDITIONS
 y0 = [0, 0]  #  initial conditions for R, E*
 y0_gk = [0]  # initial condition for Goldbeter-Koshland approximation
-t_total = 0  # to keep track of time
 
 min_S = 0
 max_S = 4
 
 # ASCENDING SIGNAL
 S_asc = np.linspace(min_S, max_S, int((max_S - min_S) / 0.01) + 1)  # signal range
-R_ss_asc = np.zeros_like(S_asc)
-R_ss_gk_asc = np.zeros_like(S_asc)
-
-for i in range(len(S_asc)):
-    p[-1] = S_asc[i]  # set current signal strength
-    # Solve ODE numerically and update arrays:
-    results = solve_ivp(ode, t_span, y0, t_eval=t_eval, args=p)
-    R_ss_asc[i] = results.y[0, -1]  # get final value of R for current signal
-    t_total += results.t[-1]
-    # Compute Goldbeter-Koshland approximation for previous numerical solution:
-    gk = solve_ivp(ode_gk, t_span, y0_gk, t_eval=t_eval, args=p)
-    R_ss_gk_asc[i] = gk.y[0, -1]
-    # Update initial conditions:
-    y0 = results.y[:, -1]
-    y0_gk = gk.y[:, -1]
+
+# Solve for the steady state at each signal, starting from the previous one:
+ss_asc = steady_state_sweep(ode, jac, y0, S_asc, p, t_span=t_span)
+ss_gk_asc = steady_state_sweep(ode_gk, jac_gk, y0_gk, S_asc, p, t_span=t_span)
+# Steady-state value of R for each signal. Just past the fold, the state passes the ghost of the fold too slowly
+# to settle within t_span; these points are not steady states and are left out (NaN) of the plots:
+R_ss_asc = np.where(ss_asc.success, ss_asc.y[:, 0], np.nan)
+R_ss_gk_asc = np.where(ss_gk_asc.success, ss_gk_asc.y[:, 0], np.nan)
 
 # DESCENDING SIGNAL
 S_desc = np.linspace(max_S, min_S, int((max_S - min_S) / 0.01) + 1)  # signal range
-R_ss_desc = np.zeros_like(S_desc)
-R_ss_gk_desc = np.zeros_like(S_desc)
-
-for i in range(len(S_desc)):
-    p[-1] = S_desc[i]  # set current signal strength
-    # Solve ODE numerically and update arrays:
-    results = solve_ivp(ode, t_span, y0, t_eval=t_eval, args=p)
-    R_ss_desc[i] = results.y[0, -1]  # get final value of R for current signal
-    t_total += results.t[-1]
-    # Compute Goldbeter-Koshland approximation for previous numerical solution:
-    gk = solve_ivp(ode_gk, t_span, y0_gk, t_eval=t_eval, args=p)
-    R_ss_gk_desc[i] = gk.y[0, -1]
-    # Update initial conditions:
-    y0 = results.y[:, -1]
-    y0_gk = gk.y[:, -1]
+
+# Continue from the last state of the ascending sweep:
+ss_desc = steady_state_sweep(ode, jac, ss_asc.y[-1], S_desc, p, t_span=t_span)
+ss_gk_desc = steady_state_sweep(ode_gk, jac_gk, ss_gk_asc.y[-1], S_desc, p, t_span=t_span)
+R_ss_desc = np.where(ss_desc.success, ss_desc.y[:, 0], np.nan)
+R_ss_gk_desc = np.where(ss_gk_desc.success, ss_gk_desc.y[:, 0], np.nan)
+
+# STORE THE SWEEPS
+if archive_path is not None:
+    with ArchiveWriter(archive_path, ["S", "R", "E", "R_gk"]) as writer:
+        writer.append(params={"direction": "ascending"}, S=S_asc, R=R_ss_asc,
+                      E=np.where(ss_asc.success, ss_asc.y[:, 1], np.nan), R_gk=R_ss_gk_asc)
+        writer.append(params={"direction": "descending"}, S=S_desc, R=R_ss_desc,
+                      E=np.where(ss_desc.success, ss_desc.y[:, 1], np.nan), R_gk=R_ss_gk_desc)
+
+# BIFURCATION DIAGRAM
+# Follow the branch through both folds to include the unstable steady states:
+branch = continuation(ode, y0, p, jac=jac, p_min=min_S - 1, p_max=max_S)
+R_unstable = np.where(branch.stable, np.nan, branch.y[:, 0])  # only keep the unstable part
+folds = [point for point in branch.special if point.kind == "LP" and min_S <= point.p <= max_S]
 
 # FIGURE 1 INITIALIZATION
 fig = plt.figure(figsize=(12, 6), dpi=100)
@@ -93,8 +78,11 @@ ax.plot(S_asc, R_ss_asc, label="$R_{SS}$", color="tab:gray", alpha=0.5)
 #ax.plot(S_asc, R_ss_gk_asc, label="$R_{SS, GK}$", color="tab:blue")
 ax.plot(S_desc, R_ss_desc, color="tab:gray", alpha=0.5)
 #ax.plot(S_desc, R_ss_gk_desc, color="tab:red")
+ax.plot(branch.p, R_unstable, label="$R_{SS}$ (unstable)", color="tab:gray", alpha=0.5, linestyle="dotted")
+ax.plot([fold.p for fold in folds], [fold.y[0] for fold in folds], linestyle="", marker="x", color="tab:gray", label="fold")
 ax.set_title("Steady-state response of the irreversible switch (ascending | descending signal)")
 ax.set_xlabel("Signal strength $S$")
+ax.set_xlim(min_S, max_S)
 ax.set_ylabel("Steady-state response $R_{SS}$")
 
 line_R_gk_asc, = ax.plot([], [], label="$R_{SS, GK}$ (ascending)", color="tab:blue", linewidth=2, linestyle="dashed")
@@ -124,5 +112,6 @@ plt.tight_layout()
 # Create and save the animation as a GIF:
 ani = FuncAnimation(fig, update, frames=len(S_asc)+len(S_desc), interval=10, repeat=False)
 
-# ani.save("signaling_response/output/steady_state_response.gif", fps=30)
+# from modeling.animation import export
+# export(fig, update, range(len(S_asc)+len(S_desc)), "signaling_response/output/steady_state_response.gif", fps=30)
 # plt.show()
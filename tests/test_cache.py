@@ -0,0 +1,73 @@
+import importlib
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # make the shared `modeling` package importable
+from modeling.cache import Cache
+
+TABLES = """
+import functools
+
+
+class Table:
+    def __init__(self, n):
+        self.n = n
+
+    def __call__(self, x):
+        return x * {factor}
+
+
+@functools.lru_cache(maxsize=None)
+def table(n):
+    return Table(n)
+"""
+
+MODELS = """
+from . import tables
+from .tables import table
+
+
+def through_global(x):
+    return table(2)(x)
+
+
+def through_module(x):
+    return tables.table(2)(x)
+"""
+
+
+@pytest.fixture
+def package(tmp_path, monkeypatch):
+    """Package `cache_test_models` whose models evaluate an lru-cached table class, and a function to edit it."""
+    root = tmp_path / "cache_test_models"
+    root.mkdir()
+    (root / "__init__.py").write_text("")
+    (root / "models.py").write_text(MODELS)
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    def load(factor):
+        (root / "tables.py").write_text(textwrap.dedent(TABLES.format(factor=factor)))
+        for name in [name for name in sys.modules if name.startswith("cache_test_models")]:
+            del sys.modules[name]
+        importlib.invalidate_caches()
+        return importlib.import_module("cache_test_models.models")
+
+    yield load
+    for name in [name for name in sys.modules if name.startswith("cache_test_models")]:
+        del sys.modules[name]
+
+
+@pytest.mark.parametrize("name", ["through_global", "through_module"])
+def test_cache_misses_when_a_table_class_changes(package, tmp_path, name):
+    cache = Cache(tmp_path / "cache")
+    models = package(factor=2)
+    assert cache.call(getattr(models, name), 3.0) == 6.0
+    assert cache.call(getattr(models, name), 3.0) == 6.0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    models = package(factor=10)  # only the table class changes, not the model or the lru_cache wrapper
+    assert cache.call(getattr(models, name), 3.0) == 30.0
+    assert (cache.hits, cache.misses) == (1, 2)